@@ -10,8 +10,20 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 from collections import Counter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import re
+import io
+import os
+import zipfile
 import json
+import hashlib
+import tempfile
+import asyncio
+import random
+import heapq
+import shutil
+import threading
 from datetime import datetime
 from pathlib import Path
 
@@ -26,6 +38,19 @@ try:
 except ImportError:
     HTML2TEXT_AVAILABLE = False
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
 # Page config
 st.set_page_config(
     page_title="Enhanced Theology Analyzer",
@@ -71,6 +96,179 @@ def detect_schema(conn):
     
     return table_name, transcript_col
 
+def get_schema_version(conn):
+    """Get SQLite's schema cookie (changes whenever tables/columns change)"""
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+@st.cache_data(show_spinner=False)
+def detect_schema_cached(db_path, schema_version):
+    """detect_schema for a database file, cached across reruns until its schema changes"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return detect_schema(conn)
+    finally:
+        conn.close()
+
+# Titles containing any of these (lowercase) are not sermons
+CONTAMINATION_KEYWORDS = [
+    'elon musk', 'grok', 'openai', 'chatgpt',
+    'justin peters', 'community bible church',
+    'trailer', 'movie clip', 'full album'
+]
+
+DB_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+DB_SEARCH_DIRS = ("/mnt/user-data/uploads", ".")
+
+def dir_signature(root):
+    """(mtime_ns, size) of a directory, which changes whenever an entry is added or removed; None if missing"""
+    try:
+        stat = os.stat(root)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_data(show_spinner=False)
+def list_dir_db_files(root, signature):
+    """Database files directly inside root, re-listed only when the directory's signature changes"""
+    with os.scandir(root) as entries:
+        # DirEntry caches its type from the directory listing, so no per-file stat()
+        return [
+            os.path.normpath(entry.path) for entry in entries
+            if entry.name.endswith(DB_EXTENSIONS) and entry.is_file(follow_symlinks=False)
+        ]
+
+def list_db_files(roots):
+    """Database files directly inside each root, in root order without duplicates (missing roots skipped)
+
+    Costs one stat() per root on a rerun; a directory is only re-read after files are added or removed.
+    """
+    found = []
+    for root in roots:
+        signature = dir_signature(root)
+        if signature is not None:
+            try:
+                found.extend(list_dir_db_files(root, signature))
+            except OSError:
+                continue
+    return list(dict.fromkeys(found))
+
+@st.cache_data(show_spinner=False)
+def scan_contamination(db_path, mtime, table_name):
+    """Find non-sermon titles in a database, cached across reruns until the file changes
+
+    Returns (contaminated_titles, total_titles)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        # instr() runs in C, so only the contaminated titles reach Python
+        conditions = " OR ".join(["instr(LOWER(title), ?) > 0"] * len(CONTAMINATION_KEYWORDS))
+        cursor = conn.execute(f"SELECT title FROM {table_name} WHERE {conditions}", CONTAMINATION_KEYWORDS)
+        contaminated = [row[0] for row in cursor]
+        
+        total = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        return contaminated, total
+    finally:
+        conn.close()
+
+def readonly_uri(db_path):
+    """SQLite URI opening a database file read-only"""
+    return Path(db_path).resolve().as_uri() + "?mode=ro"
+
+@st.cache_data(show_spinner=False)
+def db_file_stats(db_path, mtime, size):
+    """Schema and row count of a database file, cached until the file changes
+
+    Returns (table_name, transcript_col, row_count); row_count is 0 when no table is found.
+    """
+    conn = sqlite3.connect(readonly_uri(db_path), uri=True)
+    try:
+        table_name, transcript_col = detect_schema(conn)
+        if not table_name:
+            return None, None, 0
+        count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        return table_name, transcript_col, count
+    finally:
+        conn.close()
+
+@st.cache_data(show_spinner=False)
+def get_transcript_rowids(db_path, mtime, table_name, transcript_col):
+    """Rowids of rows that have a transcript, cached until the database file changes"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(f"SELECT rowid FROM {table_name} WHERE {transcript_col} IS NOT NULL")
+        return [row[0] for row in cursor]
+    finally:
+        conn.close()
+
+@st.cache_data(show_spinner=False)
+def get_corpus_stats(_conn, db_key, table_name, transcript_col):
+    """Sermon count and estimated word count, cached per db_key (the connection is not hashed)"""
+    total_count, chars = _conn.execute(f"""
+        SELECT COUNT(*), SUM(LENGTH({transcript_col}))
+        FROM {table_name}
+        WHERE {transcript_col} IS NOT NULL
+    """).fetchone()
+    return total_count, chars // 5 if chars else 0
+
+def tune_corpus_connection(conn, readonly=False):
+    """Pragmas for the read-heavy corpus databases (repeat scans stay mapped and cached)
+
+    The journal mode is stored in the file, so it is only switched when the database
+    can be written; an unwritable file (or directory) keeps its mode and opens as before.
+    """
+    if not readonly:
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError:
+            pass
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+@st.cache_resource
+def open_db(db_path):
+    """Get the shared connection for an analysis database (opened once per process)"""
+    # Streamlit reruns on different threads, so the connection must be shareable
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+    tune_corpus_connection(conn)
+    return conn
+
+def open_readonly_connection(db_path):
+    """New read-only connection to a corpus database, owned by the caller
+
+    Worker threads each open their own, so no connection is shared between threads.
+    """
+    conn = sqlite3.connect(readonly_uri(db_path), uri=True)
+    tune_corpus_connection(conn, readonly=True)
+    return conn
+
+@st.cache_resource
+def get_index_lock():
+    """Process-wide lock held while a search index is written, so there is only ever one writer"""
+    return threading.Lock()
+
+@st.cache_resource
+def open_uploaded_db(file_bytes):
+    """Save an uploaded database under its content hash and open it (once per distinct file)
+
+    Returns (path, connection, table_name, transcript_col)
+    """
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    path = Path(tempfile.gettempdir()) / f"compare_{digest}.db"
+    if not path.exists():
+        path.write_bytes(file_bytes)
+    
+    conn = sqlite3.connect(str(path), check_same_thread=False, cached_statements=256)
+    tune_corpus_connection(conn)
+    table_name, transcript_col = detect_schema(conn)
+    return str(path), conn, table_name, transcript_col
+
+@st.cache_resource
+def get_anthropic_client():
+    """Get the shared Claude client (keeps its HTTP connection pool across reruns)"""
+    return anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+
 def get_db_connection(db_path):
     """Connect to database and detect schema"""
     if not Path(db_path).exists():
@@ -78,8 +276,8 @@ def get_db_connection(db_path):
         return None, None, None
     
     try:
-        conn = sqlite3.connect(db_path)
-        table_name, transcript_col = detect_schema(conn)
+        conn = open_db(db_path)
+        table_name, transcript_col = detect_schema_cached(db_path, get_schema_version(conn))
         
         if not table_name:
             st.error("No valid transcripts table found")
@@ -90,10 +288,383 @@ def get_db_connection(db_path):
         st.error(f"Database error: {e}")
         return None, None, None
 
+# Search indexes live in sidecar files, never inside the user's databases (see ensure_fts_index)
+FTS_INDEX_DIR = Path(tempfile.gettempdir()) / "compare_search_indexes"
+FTS_INDEX_TABLE = "sermon_fts"
+
+def fts_index_path(db_path, table_name, transcript_col):
+    """Sidecar file holding the search index for one database's transcript column"""
+    key = f"{Path(db_path).resolve()}|{table_name}|{transcript_col}"
+    return FTS_INDEX_DIR / f"{Path(db_path).stem}-{hashlib.sha256(key.encode()).hexdigest()[:16]}.fts"
+
+def fts_index_version(index_path):
+    """Source file version an index was built from, or None if there is no usable index"""
+    if not index_path.exists():
+        return None
+    try:
+        conn = sqlite3.connect(readonly_uri(index_path), uri=True)
+        try:
+            return conn.execute("SELECT value FROM index_meta WHERE key = 'source_version'").fetchone()[0]
+        finally:
+            conn.close()
+    except (sqlite3.Error, TypeError):
+        return None
+
+def ensure_fts_index(db_path, table_name, transcript_col):
+    """Build (once per file version) an FTS5 index over the transcript column in a sidecar file
+
+    The source database is only read: the index is a contentless FTS5 table (rowid = the
+    source row's id) in a separate file under the temp directory, so the user's file, its
+    mtime and every cache keyed on it stay untouched. The index is rebuilt when the source
+    file changes and written under the index lock, so there is only ever one writer.
+    Returns the index path, or None if it can't be built (SQLite without FTS5, etc.)
+    """
+    stat = os.stat(db_path)
+    version = f"{stat.st_mtime_ns}:{stat.st_size}"
+    index_path = fts_index_path(db_path, table_name, transcript_col)
+    
+    with get_index_lock():
+        if fts_index_version(index_path) == version:
+            return str(index_path)
+        
+        # Build beside the final name, then swap it in (readers never see a half-built index)
+        building = index_path.with_name(index_path.name + ".building")
+        
+        try:
+            FTS_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+            building.unlink(missing_ok=True)
+            conn = sqlite3.connect(building.resolve().as_uri(), uri=True)
+            try:
+                conn.execute("ATTACH DATABASE ? AS src", (readonly_uri(db_path),))
+                conn.execute(f"""
+                    CREATE VIRTUAL TABLE {FTS_INDEX_TABLE} USING fts5(
+                        transcript,
+                        content='',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                """)
+                conn.execute(f"""
+                    INSERT INTO {FTS_INDEX_TABLE}(rowid, transcript)
+                    SELECT id, {transcript_col} FROM src.{table_name}
+                    WHERE {transcript_col} IS NOT NULL
+                """)
+                conn.execute("CREATE TABLE index_meta (key TEXT PRIMARY KEY, value TEXT)")
+                conn.execute("INSERT INTO index_meta VALUES ('source_version', ?)", (version,))
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(building, index_path)
+        except (sqlite3.Error, OSError):
+            building.unlink(missing_ok=True)
+            return None
+    
+    return str(index_path)
+
+def open_fts_search(index_path, db_path):
+    """Read-only connection to a sidecar index with its source database attached as src"""
+    conn = sqlite3.connect(readonly_uri(index_path), uri=True)
+    conn.execute("ATTACH DATABASE ? AS src", (readonly_uri(db_path),))
+    return conn
+
+def count_sermons_matching(conn, table_name, transcript_col, terms):
+    """Count sermons that mention each term (case-insensitive substring), in a single query
+
+    Every term is counted in the same LIKE pass over the table.
+    Returns counts in the same order as terms.
+    """
+    if not terms:
+        return []
+    
+    sums = ", ".join([f"SUM({transcript_col} LIKE ?)"] * len(terms))
+    cursor = conn.execute(
+        f"SELECT {sums} FROM {table_name}",
+        [f'%{term.lower()}%' for term in terms]
+    )
+    return [count or 0 for count in cursor.fetchone()]
+
+def iter_rows(cursor, batch_size=256):
+    """Yield rows from an executed cursor in fetchmany batches (bounded memory)"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+def chunked(items, size):
+    """Yield consecutive lists of up to size items"""
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def spread_by_database(sources):
+    """Reorder sources grouped by database so each database is spread evenly through the list
+
+    Each source is placed by its relative position within its database, so a database
+    supplying twice as many sermons shows up about twice as often in every stretch.
+    """
+    by_database = {}
+    for source in sources:
+        by_database.setdefault(source['database'], []).append(source)
+    
+    placed = [
+        ((i + 0.5) / len(group), source)
+        for group in by_database.values()
+        for i, source in enumerate(group)
+    ]
+    placed.sort(key=lambda item: item[0])
+    return [source for _, source in placed]
+
+def fts_phrase_query(term, prefix=True):
+    """Quote a user search term as a single FTS5 phrase (last word prefix-matched)"""
+    phrase = '"' + term.replace('"', '""') + '"'
+    return phrase + ' *' if prefix else phrase
+
+def llm_cache_key(prompt, model, max_tokens):
+    """Hash identifying one Claude request (same model, limit and prompt -> same key)
+
+    prompt is the message text or a list of content blocks.
+    """
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True)
+    return hashlib.sha256(f"{model}\n{max_tokens}\n{prompt}".encode("utf-8")).hexdigest()
+
+def cached_prefix_prompt(prefix, text):
+    """Message content whose large, reusable prefix is marked for Anthropic's prompt cache"""
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": text}
+    ]
+
+# Ask Questions dropdown
+CANNED_QUESTIONS = (
+    "What does this teacher say about the nature of God?",
+    "What is this teacher's view of the Holy Spirit?",
+    "How does this teacher handle Scripture?",
+    "What does this teacher teach about salvation?",
+    "What does this teacher say about spiritual warfare?",
+    "What does this teacher teach about prosperity/finances?",
+    "What does this teacher say about healing?",
+    "How does this teacher view the end times/eschatology?",
+    "What does this teacher say about spiritual gifts?",
+    "What does this teacher teach about prayer?",
+    "What is this teacher's view of sin and holiness?",
+    "What does this teacher say about suffering?",
+    "How does this teacher view the role of prophets/prophecy?",
+    "What does this teacher say about deliverance/demons?",
+    "What is this teacher's view of the church?",
+    "What does this teacher teach about grace vs works?",
+    "What does this teacher say about faith?",
+    "How does this teacher view miracles and signs?",
+    "What does this teacher say about the cross/atonement?",
+    "What is this teacher's view of generational curses?"
+)
+
+# Reworded questions at least this similar (cosine) can reuse the earlier answer
+QUESTION_SIMILARITY = 0.92
+
+@st.cache_resource
+def get_question_encoder():
+    """Small sentence-embedding model for matching reworded questions (loaded once)"""
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+@st.cache_resource
+def get_canned_embeddings():
+    """Embeddings of every canned question, encoded together in one batch (rows follow CANNED_QUESTIONS)"""
+    return get_question_encoder().encode(list(CANNED_QUESTIONS), normalize_embeddings=True).astype(np.float32)
+
+def embed_question(question):
+    """Unit-length float32 embedding of a question"""
+    if question in CANNED_QUESTIONS:
+        return get_canned_embeddings()[CANNED_QUESTIONS.index(question)]
+    return get_question_encoder().encode(question, normalize_embeddings=True).astype(np.float32)
+
+def normalize_question(question):
+    """Question text with case and whitespace differences removed"""
+    return " ".join(question.lower().split())
+
+def find_similar_answer(db_path, question, reworded=False):
+    """Earlier answer (this session, same database) to the same question
+
+    Returns {'question', 'answer', 'sources'} or None. Only the same question
+    (ignoring case and spacing) matches unless reworded is set, which also
+    accepts questions that mean the same thing (needs sentence-transformers).
+    """
+    entries = st.session_state.setdefault('q_cache', {}).get(db_path)
+    if not entries:
+        return None
+    
+    key = normalize_question(question)
+    for entry in entries['answers']:
+        if normalize_question(entry['question']) == key:
+            return entry
+    
+    if not reworded or not SENTENCE_TRANSFORMERS_AVAILABLE:
+        return None
+    
+    # Embed answers remembered since the last lookup (nothing is embedded until reuse is on)
+    embedded = 0 if entries['embeddings'] is None else len(entries['embeddings'])
+    if embedded < len(entries['answers']):
+        new = np.vstack([embed_question(entry['question']) for entry in entries['answers'][embedded:]])
+        entries['embeddings'] = new if entries['embeddings'] is None else np.vstack([entries['embeddings'], new])
+    
+    # Embeddings are stacked row-wise, so one matrix-vector product scores them all
+    scores = entries['embeddings'] @ embed_question(question)
+    best = int(scores.argmax())
+    return entries['answers'][best] if scores[best] >= QUESTION_SIMILARITY else None
+
+def remember_answer(db_path, question, answer, sources):
+    """Add an answered question to this session's answer cache"""
+    q_cache = st.session_state.setdefault('q_cache', {})
+    entries = q_cache.setdefault(db_path, {'embeddings': None, 'answers': []})
+    entries['answers'].append({'question': question, 'answer': answer, 'sources': sources})
+
+# Excerpts sharing more than this fraction of 5-word shingles are treated as duplicates
+EXCERPT_SIMILARITY = 0.8
+
+# Shingle signatures kept per session (oldest dropped first)
+EXCERPT_SIGNATURE_CACHE_SIZE = 200
+
+def excerpt_window(text, terms, size=3000):
+    """Size-char window of text centred on the earliest hit of any term"""
+    text_lower = text.lower()
+    hits = [pos for pos in (text_lower.find(term) for term in terms) if pos >= 0]
+    start = max(0, min(hits) - size // 2) if hits else 0
+    return text[start:start + size]
+
+def excerpt_signature(text):
+    """Set of an excerpt's 5-word shingles"""
+    words = text.lower().split()
+    return frozenset(" ".join(words[i:i + 5]) for i in range(max(1, len(words) - 4)))
+
+def excerpt_similarity(a, b):
+    """Jaccard similarity of two excerpt signatures"""
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def drop_similar_excerpts(excerpts):
+    """Keep (title, excerpt) pairs in order, skipping near-duplicates of ones already kept
+    
+    Signatures are cached by a hash of the excerpt text, so a changed database or
+    window size never reuses a stale one.
+    """
+    signatures = st.session_state.setdefault('excerpt_signatures', {})
+    kept = []
+    
+    for title, excerpt in excerpts:
+        key = hashlib.sha1(excerpt.encode("utf-8")).hexdigest()
+        signature = signatures.pop(key, None)
+        if signature is None:
+            signature = excerpt_signature(excerpt)
+        # Re-inserted on every use, so the dict stays ordered oldest use first
+        signatures[key] = signature
+        
+        if all(excerpt_similarity(signature, other) <= EXCERPT_SIMILARITY for _, _, other in kept):
+            kept.append((title, excerpt, signature))
+    
+    while len(signatures) > EXCERPT_SIGNATURE_CACHE_SIZE:
+        del signatures[next(iter(signatures))]
+    
+    return [(title, excerpt) for title, excerpt, _ in kept]
+
+def run_claude_prompts(prompts, model="claude-sonnet-4-20250514", max_tokens=1500, max_concurrent=4,
+                       on_progress=None, use_cache=True):
+    """Send several prompts to Claude concurrently and return the replies in order
+
+    A prompt is message text or a list of content blocks (see cached_prefix_prompt).
+    Replies already in this session's cache are reused without a request; with
+    use_cache=False every prompt is sent and nothing is cached (fresh drafts).
+    A failed request comes back as its exception instead of the reply text.
+    on_progress(done, total) is called as each reply arrives, in completion order.
+    """
+    cache = st.session_state.setdefault('llm_cache', {}) if use_cache else {}
+    keys = [llm_cache_key(p, model, max_tokens) for p in prompts]
+    missing = [p for p, key in zip(prompts, keys) if key not in cache]
+    done = len(prompts) - len(missing)
+    
+    if on_progress and done:
+        on_progress(done, len(prompts))
+    
+    async def run_all():
+        semaphore = asyncio.Semaphore(max_concurrent)
+        async with anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY) as client:
+            async def run_one(prompt):
+                nonlocal done
+                try:
+                    async with semaphore:
+                        message = await client.messages.create(
+                            model=model,
+                            max_tokens=max_tokens,
+                            messages=[{"role": "user", "content": prompt}]
+                        )
+                        return message.content[0].text
+                finally:
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(prompts))
+            
+            return await asyncio.gather(*[run_one(p) for p in missing], return_exceptions=True)
+    
+    fetched = iter(asyncio.run(run_all()) if missing else [])
+    replies = []
+    for key in keys:
+        if key in cache:
+            replies.append(cache[key])
+            continue
+        reply = next(fetched)
+        if not isinstance(reply, Exception):
+            cache[key] = reply
+        replies.append(reply)
+    return replies
+
+def stream_claude_reply(placeholder, prompt, model="claude-sonnet-4-20250514", max_tokens=2000,
+                        unsafe_allow_html=False):
+    """Render a Claude reply into a placeholder as it streams in and return the full text
+    
+    An identical request made earlier this session is re-rendered from the cache.
+    """
+    cache = st.session_state.setdefault('llm_cache', {})
+    key = llm_cache_key(prompt, model, max_tokens)
+    
+    if key in cache:
+        placeholder.markdown(cache[key], unsafe_allow_html=unsafe_allow_html)
+        return cache[key]
+    
+    parts = []
+    with get_anthropic_client().messages.stream(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": prompt}]
+    ) as stream:
+        for delta in stream.text_stream:
+            parts.append(delta)
+            placeholder.markdown("".join(parts), unsafe_allow_html=unsafe_allow_html)
+    
+    cache[key] = "".join(parts)
+    return cache[key]
+
+@st.cache_data(show_spinner=False)
+def html_to_markdown(html):
+    """Markdown version of generated HTML (links kept), converted once per distinct HTML"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = False
+    return converter.handle(html)
+
+@st.cache_data(show_spinner=False)
+def build_zip(files):
+    """ZIP archive bytes for a tuple of (file_name, text) pairs, built once per distinct contents
+
+    Entries are stored uncompressed: a few KB of text per post gains little from deflate.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for file_name, text in files:
+            archive.writestr(file_name, text)
+    return buffer.getvalue()
+
 # ============================================================================
 # SERIES LIBRARY DATABASE
 # ============================================================================
 
+@st.cache_resource
 def init_series_library():
     """Initialize Series Library database"""
     library_path = Path("/mnt/user-data/outputs/series_library.db")
@@ -123,8 +694,8 @@ def init_series_library():
     """)
     
     # Create posts table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS posts (
+    posts_ddl = """
+        CREATE TABLE IF NOT EXISTS {name} (
             post_id INTEGER PRIMARY KEY AUTOINCREMENT,
             series_id INTEGER,
             post_number INTEGER,
@@ -134,8 +705,59 @@ def init_series_library():
             word_count INTEGER,
             sources_used TEXT,
             date_created TEXT,
-            FOREIGN KEY (series_id) REFERENCES series_library(series_id)
+            FOREIGN KEY (series_id) REFERENCES series_library(series_id) ON DELETE CASCADE
         )
+    """
+    cursor.execute(posts_ddl.format(name='posts'))
+    
+    # Migrate libraries created before posts cascaded on series delete
+    # (SQLite can't alter a foreign key, so the table is rebuilt)
+    cursor.execute("PRAGMA foreign_key_list(posts)")
+    if any(fk[6].upper() != 'CASCADE' for fk in cursor.fetchall()):
+        cursor.execute("BEGIN")
+        cursor.execute(posts_ddl.format(name='posts_migrated'))
+        cursor.execute("INSERT INTO posts_migrated SELECT * FROM posts")
+        cursor.execute("DROP TABLE posts")
+        cursor.execute("ALTER TABLE posts_migrated RENAME TO posts")
+        conn.commit()
+    
+    # Indexes for newest-first listing and per-series post lookups
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_series_date ON series_library(date_created DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_series ON posts(series_id, post_number)")
+    
+    # Full-text index over title/topic for search_series
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='series_search'")
+    if not cursor.fetchone():
+        cursor.execute("""
+            CREATE VIRTUAL TABLE series_search USING fts5(
+                series_title, topic,
+                content='series_library',
+                content_rowid='series_id',
+                tokenize='unicode61'
+            )
+        """)
+        cursor.execute("INSERT INTO series_search(series_search) VALUES('rebuild')")
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS series_search_ai AFTER INSERT ON series_library BEGIN
+            INSERT INTO series_search(rowid, series_title, topic)
+            VALUES (new.series_id, new.series_title, new.topic);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS series_search_ad AFTER DELETE ON series_library BEGIN
+            INSERT INTO series_search(series_search, rowid, series_title, topic)
+            VALUES ('delete', old.series_id, old.series_title, old.topic);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS series_search_au
+        AFTER UPDATE OF series_title, topic ON series_library BEGIN
+            INSERT INTO series_search(series_search, rowid, series_title, topic)
+            VALUES ('delete', old.series_id, old.series_title, old.topic);
+            INSERT INTO series_search(rowid, series_title, topic)
+            VALUES (new.series_id, new.series_title, new.topic);
+        END
     """)
     
     conn.commit()
@@ -143,62 +765,86 @@ def init_series_library():
     
     return str(library_path)
 
+@st.cache_resource
+def get_library_conn():
+    """Get the shared Series Library connection (opened and tuned once per process)"""
+    library_path = init_series_library()
+    
+    # Streamlit reruns on different threads, so the connection must be shareable
+    conn = sqlite3.connect(library_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA foreign_keys=ON")
+    
+    return conn
+
 def save_series_to_library(series_data):
     """Save a generated series to the library"""
-    library_path = init_series_library()
-    conn = sqlite3.connect(library_path)
-    cursor = conn.cursor()
+    conn = get_library_conn()
+    now_iso = datetime.now().isoformat()
     
-    # Insert series metadata
-    cursor.execute("""
-        INSERT INTO series_library (
-            series_title, topic, num_posts, audience, style, post_length,
-            date_created, source_databases, total_words, total_cost, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        series_data['title'],
-        series_data['topic'],
-        series_data['num_posts'],
-        series_data['audience'],
-        series_data['style'],
-        series_data['post_length'],
-        datetime.now().isoformat(),
-        json.dumps(series_data['source_databases']),
-        series_data['total_words'],
-        series_data.get('cost', 0),
-        'draft'
-    ))
-    
-    series_id = cursor.lastrowid
-    
-    # Insert posts
-    for post in series_data['posts']:
+    with conn:
+        cursor = conn.cursor()
+        
+        # Insert series metadata
         cursor.execute("""
+            INSERT INTO series_library (
+                series_title, topic, num_posts, audience, style, post_length,
+                date_created, source_databases, total_words, total_cost, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            series_data['title'],
+            series_data['topic'],
+            series_data['num_posts'],
+            series_data['audience'],
+            series_data['style'],
+            series_data['post_length'],
+            now_iso,
+            json.dumps(series_data['source_databases']),
+            series_data['total_words'],
+            series_data.get('cost', 0),
+            'draft'
+        ))
+        
+        series_id = cursor.lastrowid
+        
+        # Insert posts (one prepared statement for the whole batch)
+        cursor.executemany("""
             INSERT INTO posts (
                 series_id, post_number, post_title, html_content, 
                 markdown_content, word_count, sources_used, date_created
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            series_id,
-            post['post_num'],
-            post.get('title', f"Post {post['post_num']}"),
-            post['html'],
-            post.get('markdown', ''),
-            post.get('word_count', 0),
-            json.dumps(post.get('sources', [])),
-            datetime.now().isoformat()
-        ))
-    
-    conn.commit()
-    conn.close()
+        """, [
+            (
+                series_id,
+                post['post_num'],
+                post.get('title', f"Post {post['post_num']}"),
+                post['html'],
+                post.get('markdown', ''),
+                post.get('word_count', 0),
+                json.dumps(post.get('sources', [])),
+                now_iso
+            )
+            for post in series_data['posts']
+        ])
     
+    clear_library_caches()
     return series_id
 
+def clear_library_caches():
+    """Drop cached library reads after any write, so the next rerun sees the change"""
+    get_all_series.clear()
+    get_series_details.clear()
+    search_series.clear()
+    library_stats.clear()
+
+@st.cache_data(ttl=60, show_spinner=False)
 def get_all_series():
     """Get all series from library"""
-    library_path = init_series_library()
-    conn = sqlite3.connect(library_path)
-    cursor = conn.cursor()
+    cursor = get_library_conn().cursor()
     
     cursor.execute("""
         SELECT series_id, series_title, topic, num_posts, audience, 
@@ -207,16 +853,24 @@ def get_all_series():
         ORDER BY date_created DESC
     """)
     
-    series = cursor.fetchall()
-    conn.close()
+    return cursor.fetchall()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def library_stats():
+    """Get (series, posts, words) totals for the whole library in one aggregate query"""
+    cursor = get_library_conn().cursor()
+    
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(num_posts), 0), COALESCE(SUM(total_words), 0)
+        FROM series_library
+    """)
     
-    return series
+    return cursor.fetchone()
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_series_details(series_id):
     """Get complete details for a series"""
-    library_path = init_series_library()
-    conn = sqlite3.connect(library_path)
-    cursor = conn.cursor()
+    cursor = get_library_conn().cursor()
     
     # Get series metadata
     cursor.execute("""
@@ -226,7 +880,6 @@ def get_series_details(series_id):
     series_data = cursor.fetchone()
     
     if not series_data:
-        conn.close()
         return None
     
     # Get posts
@@ -235,66 +888,194 @@ def get_series_details(series_id):
     """, (series_id,))
     
     posts = cursor.fetchall()
-    conn.close()
     
-    return {'series': series_data, 'posts': posts}
+    # Source weights are stored as JSON; parse them here so the cached details carry the dict
+    try:
+        sources = json.loads(series_data[8]) if series_data[8] else {}
+    except ValueError:
+        sources = {}
+    
+    return {'series': series_data, 'posts': posts, 'sources': sources}
 
 def delete_series(series_id):
     """Delete a series and all its posts"""
-    library_path = init_series_library()
-    conn = sqlite3.connect(library_path)
-    cursor = conn.cursor()
+    conn = get_library_conn()
     
-    cursor.execute("DELETE FROM posts WHERE series_id = ?", (series_id,))
-    cursor.execute("DELETE FROM series_library WHERE series_id = ?", (series_id,))
+    # Posts go with it via ON DELETE CASCADE
+    with conn:
+        conn.execute("DELETE FROM series_library WHERE series_id = ?", (series_id,))
     
-    conn.commit()
-    conn.close()
+    clear_library_caches()
+
+def update_series_status(series_id, status):
+    """Set a series' status (draft/published)"""
+    conn = get_library_conn()
+    
+    with conn:
+        conn.execute("UPDATE series_library SET status = ? WHERE series_id = ?", (status, series_id))
+    
+    clear_library_caches()
+
+def format_library_date(date_created):
+    """Library ISO timestamp as e.g. 'March 05, 2025' (left as stored if it doesn't parse)"""
+    try:
+        return datetime.fromisoformat(date_created).strftime("%B %d, %Y")
+    except (TypeError, ValueError):
+        return date_created
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
 
+@st.cache_data(show_spinner=False)
+def post_preview(html, limit=500):
+    """Plain-text opening of a post's HTML (cutting raw HTML at a fixed length can split a tag)"""
+    text = " ".join(_HTML_TAG_RE.sub(" ", html).split())
+    return text[:limit] + "..." if len(text) > limit else text
+
+@st.cache_data(ttl=60, show_spinner=False)
 def search_series(search_term):
     """Search series by title or topic"""
-    library_path = init_series_library()
-    conn = sqlite3.connect(library_path)
-    cursor = conn.cursor()
+    cursor = get_library_conn().cursor()
     
-    cursor.execute("""
-        SELECT series_id, series_title, topic, num_posts, audience,
-               date_created, status, total_words
-        FROM series_library
-        WHERE series_title LIKE ? OR topic LIKE ?
-        ORDER BY date_created DESC
-    """, (f'%{search_term}%', f'%{search_term}%'))
+    # Terms with no word characters have no FTS5 tokens - use a plain scan
+    if not re.search(r'\w', search_term):
+        cursor.execute("""
+            SELECT series_id, series_title, topic, num_posts, audience,
+                   date_created, status, total_words
+            FROM series_library
+            WHERE series_title LIKE ? OR topic LIKE ?
+            ORDER BY date_created DESC
+        """, (f'%{search_term}%', f'%{search_term}%'))
+        
+        return cursor.fetchall()
     
-    results = cursor.fetchall()
-    conn.close()
+    cursor.execute("""
+        SELECT s.series_id, s.series_title, s.topic, s.num_posts, s.audience,
+               s.date_created, s.status, s.total_words
+        FROM series_library s
+        JOIN series_search f ON f.rowid = s.series_id
+        WHERE series_search MATCH ?
+        ORDER BY s.date_created DESC
+    """, (fts_phrase_query(search_term),))
     
-    return results
+    return cursor.fetchall()
 
 # ============================================================================
 # COMPREHENSIVE ANALYSIS ENGINE
 # ============================================================================
 
+# Series title patterns (compiled once, used per title in detect_series)
+_PART_SPLIT_RE = re.compile(r'\s+-\s+Part|\s+Part')
+_TRAILING_NUM_RE = re.compile(r'(.+?)\s+\d+$')
+
 class ComprehensiveAnalyzer:
     """Full corpus analysis with complete processing (no sampling)"""
     
+    # NAR and theological markers
+    TARGET_PHRASES = [
+        # NAR markers
+        'courts of heaven', 'court of heaven', 'DNA healing', 'wounded soul', 
+        'soul wound', 'wounding spirit', 'leviathan spirit', 'jezebel spirit',
+        'python spirit', 'generational curse', 'territorial spirits',
+        'seven mountains', 'apostolic center', 'prophetic word',
+        
+        # Prosperity
+        'name it claim it', 'speak into existence', 'seed faith', 
+        'hundredfold return', 'breakthrough anointing', 'supernatural favor',
+        
+        # Kingdom/Third Wave
+        'kingdom of god', 'kingdom now', 'power encounter', 'signs and wonders',
+        'holy spirit', 'baptism of the spirit', 'spiritual gifts', 
+        'word of knowledge',
+        
+        # Orthodox markers
+        'gospel of', 'grace of god', 'blood of christ', 'atonement',
+        'justification', 'sanctification', 'repentance', 'faith alone',
+        'scripture alone', 'sola scriptura'
+    ]
+    
+    # How phrase and keyword counts are made, shown next to them in reports
+    COUNT_NOTE = (
+        "Counts are case-insensitive substring occurrences across every sermon "
+        "(e.g. 'sin' also counts 'sinful' and 'business')."
+    )
+    
+    # Theological keywords
+    KEYWORDS = [
+        # Trinitarian
+        'god', 'jesus', 'christ', 'holy spirit', 'spirit',
+        
+        # Salvation
+        'gospel', 'salvation', 'saved', 'grace', 'faith',
+        'repent', 'sin', 'cross', 'blood', 'atonement',
+        
+        # Charismatic
+        'healing', 'miracle', 'prophetic', 'prophecy',
+        'tongues', 'anointing', 'demon', 'deliverance',
+        
+        # Prosperity/NAR
+        'blessing', 'blessed', 'prosperity', 'favor',
+        'breakthrough', 'abundance', 'wealth',
+        
+        # Kingdom
+        'kingdom', 'church', 'worship', 'prayer'
+    ]
+    
     def __init__(self, conn, table_name, transcript_col):
         self.conn = conn
         self.table_name = table_name
         self.transcript_col = transcript_col
         self.cursor = conn.cursor()
+        self._basic_stats = None
+        self._date_col = False  # False = not looked up yet (None = no date column)
+        self._term_counts_cache = None
+        
+        # Table/column are fixed per analyzer, so build the SQL text once;
+        # identical text lets sqlite3's statement cache reuse the prepared plan
+        self._sql_stats = f"""
+            SELECT 
+                COUNT(*) as total,
+                SUM(LENGTH({transcript_col})) as total_chars
+            FROM {table_name}
+            WHERE {transcript_col} IS NOT NULL
+        """
+        self._sql_all_text = f"""
+            SELECT {transcript_col} FROM {table_name}
+            WHERE {transcript_col} IS NOT NULL
+        """
+        self._sql_all_bytes = f"""
+            SELECT CAST({transcript_col} AS BLOB) FROM {table_name}
+            WHERE {transcript_col} IS NOT NULL
+        """
+        self._sql_titles = f"SELECT title FROM {table_name} WHERE title IS NOT NULL"
+        self._sql_rowids = f"SELECT rowid FROM {table_name} WHERE {transcript_col} IS NOT NULL"
+        self._sql_samples = f"""
+            SELECT * FROM (
+                SELECT title, substr({transcript_col}, 1, 1500) FROM {table_name}
+                WHERE {transcript_col} IS NOT NULL
+                ORDER BY id ASC LIMIT 2
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT title, substr({transcript_col}, 1, 1500) FROM {table_name}
+                WHERE {transcript_col} IS NOT NULL
+                ORDER BY id DESC LIMIT 2
+            )
+        """
+        self._sql_picked_samples = f"""
+            SELECT title, substr({transcript_col}, 1, 1500) FROM {table_name}
+            WHERE rowid IN ({{picked}})
+        """
     
     def get_basic_stats(self):
         """Get comprehensive statistics"""
-        self.cursor.execute(f"""
-            SELECT 
-                COUNT(*) as total,
-                SUM(LENGTH({self.transcript_col})) as total_chars,
-                AVG(LENGTH({self.transcript_col})) as avg_chars
-            FROM {self.table_name}
-            WHERE {self.transcript_col} IS NOT NULL
-        """)
+        if self._basic_stats is not None:
+            return self._basic_stats
         
-        total, total_chars, avg_chars = self.cursor.fetchone()
+        # LENGTH() once per row - the average is derived from SUM/COUNT
+        self.cursor.execute(self._sql_stats)
+        
+        total, total_chars = self.cursor.fetchone()
+        avg_chars = total_chars / total if total else 0
         
         # Word count approximation
         total_words = total_chars // 5 if total_chars else 0
@@ -314,102 +1095,108 @@ class ComprehensiveAnalyzer:
             if min_date and max_date:
                 date_range = f"{min_date[:10]} to {max_date[:10]}"
         
-        return {
+        self._basic_stats = {
             'total_sermons': total,
             'total_words': total_words,
             'avg_words': avg_words,
             'date_range': date_range
         }
+        
+        return self._basic_stats
     
     def _find_date_column(self):
         """Find date column in table"""
+        if self._date_col is not False:
+            return self._date_col
+        
         self.cursor.execute(f"PRAGMA table_info({self.table_name})")
         columns = [col[1] for col in self.cursor.fetchall()]
         
+        self._date_col = None
         for col in ['published_at', 'created_at', 'created_date']:
             if col in columns:
-                return col
-        return None
+                self._date_col = col
+                break
+        
+        return self._date_col
     
     def find_all_phrases(self, min_occurrences=20):
         """Find ALL repeated phrases across ENTIRE corpus (no sampling)"""
+        counts = self._term_counts()
         
-        # NAR and theological markers
-        target_phrases = [
-            # NAR markers
-            'courts of heaven', 'court of heaven', 'DNA healing', 'wounded soul', 
-            'soul wound', 'wounding spirit', 'leviathan spirit', 'jezebel spirit',
-            'python spirit', 'generational curse', 'territorial spirits',
-            'seven mountains', 'apostolic center', 'prophetic word',
-            
-            # Prosperity
-            'name it claim it', 'speak into existence', 'seed faith', 
-            'hundredfold return', 'breakthrough anointing', 'supernatural favor',
-            
-            # Kingdom/Third Wave
-            'kingdom of god', 'kingdom now', 'power encounter', 'signs and wonders',
-            'holy spirit', 'baptism of the spirit', 'spiritual gifts', 
-            'word of knowledge',
-            
-            # Orthodox markers
-            'gospel of', 'grace of god', 'blood of christ', 'atonement',
-            'justification', 'sanctification', 'repentance', 'faith alone',
-            'scripture alone', 'sola scriptura'
-        ]
-        
-        # Get ALL text (complete corpus)
-        self.cursor.execute(f"SELECT {self.transcript_col} FROM {self.table_name}")
-        all_text = ' '.join([row[0] for row in self.cursor.fetchall() if row[0]])
-        all_text_lower = all_text.lower()
-        
-        phrase_counts = {}
-        for phrase in target_phrases:
-            count = all_text_lower.count(phrase.lower())
-            if count >= min_occurrences:
-                phrase_counts[phrase] = count
+        phrase_counts = {
+            phrase: counts[phrase] for phrase in self.TARGET_PHRASES
+            if counts[phrase] >= min_occurrences
+        }
         
         return dict(sorted(phrase_counts.items(), key=lambda x: x[1], reverse=True))
     
     def count_keywords(self):
         """Count ALL theological keywords across ENTIRE corpus"""
+        counts = self._term_counts()
         
-        keywords = {
-            # Trinitarian
-            'god': 0, 'jesus': 0, 'christ': 0, 'holy spirit': 0, 'spirit': 0,
-            
-            # Salvation
-            'gospel': 0, 'salvation': 0, 'saved': 0, 'grace': 0, 'faith': 0,
-            'repent': 0, 'sin': 0, 'cross': 0, 'blood': 0, 'atonement': 0,
-            
-            # Charismatic
-            'healing': 0, 'miracle': 0, 'prophetic': 0, 'prophecy': 0,
-            'tongues': 0, 'anointing': 0, 'demon': 0, 'deliverance': 0,
-            
-            # Prosperity/NAR
-            'blessing': 0, 'blessed': 0, 'prosperity': 0, 'favor': 0,
-            'breakthrough': 0, 'abundance': 0, 'wealth': 0,
+        keywords = {keyword: counts[keyword] for keyword in self.KEYWORDS}
+        
+        return dict(sorted(keywords.items(), key=lambda x: x[1], reverse=True))
+    
+    def _term_counts(self):
+        """Count every target phrase and keyword together, once per analyzer
+        
+        Counts are case-insensitive substring occurrences (see COUNT_NOTE), so they don't
+        depend on which scan runs or whether a search index exists.
+        """
+        if self._term_counts_cache is None:
+            terms = list(dict.fromkeys(self.TARGET_PHRASES + self.KEYWORDS))
             
-            # Kingdom
-            'kingdom': 0, 'church': 0, 'worship': 0, 'prayer': 0
-        }
+            # One streamed scan of ALL text for both lists
+            self._term_counts_cache = self._count_by_scan(terms)
         
-        # Get ALL text
-        self.cursor.execute(f"SELECT {self.transcript_col} FROM {self.table_name}")
-        all_text = ' '.join([row[0].lower() for row in self.cursor.fetchall() if row[0]])
+        return self._term_counts_cache
+    
+    def _count_by_scan(self, terms):
+        """Count substring occurrences of every term in one pass over the corpus"""
+        counts = Counter()
         
-        for keyword in keywords.keys():
-            keywords[keyword] = all_text.count(keyword)
+        if AHOCORASICK_AVAILABLE:
+            # One linear pass per sermon finds every term at once
+            automaton = ahocorasick.Automaton()
+            for term in terms:
+                automaton.add_word(term.lower(), (term, len(term.lower())))
+            automaton.make_automaton()
+            
+            self.cursor.execute(self._sql_all_text)
+            for (text,) in self.cursor:
+                # The automaton reports overlapping hits; skip those, as str.count does
+                last_end = {}
+                for end, (term, length) in automaton.iter(text.lower()):
+                    if end - length >= last_end.get(term, -1):
+                        last_end[term] = end
+                        counts[term] += 1
+        else:
+            # Raw UTF-8 bytes: no decode, and ASCII-only bytes.lower() is cheaper.
+            # Terms are lowercased once, outside the row loop
+            lowered = [(term.lower().encode('utf-8'), term) for term in terms]
+            
+            self.cursor.execute(self._sql_all_bytes)
+            for (text,) in self.cursor:
+                # bytes.lower() only folds ASCII; other text needs str.lower() (e.g. the
+                # Kelvin sign lowercases to "k") to count the same as the automaton
+                if text.isascii():
+                    text_lower = text.lower()
+                else:
+                    text_lower = text.decode('utf-8').lower().encode('utf-8')
+                for term_lower, term in lowered:
+                    counts[term] += text_lower.count(term_lower)
         
-        return dict(sorted(keywords.items(), key=lambda x: x[1], reverse=True))
+        return counts
     
     def detect_series(self):
         """Detect sermon series"""
-        self.cursor.execute(f"SELECT title FROM {self.table_name} WHERE title IS NOT NULL")
-        titles = [row[0] for row in self.cursor.fetchall()]
+        self.cursor.execute(self._sql_titles)
         
         series = Counter()
         
-        for title in titles:
+        for (title,) in self.cursor:
             # Pattern 1: "Series Name: Episode"
             if ':' in title:
                 series_name = title.split(':')[0].strip()
@@ -417,50 +1204,56 @@ class ComprehensiveAnalyzer:
             
             # Pattern 2: "Series - Part N"
             elif ' - Part ' in title or ' Part ' in title:
-                series_name = re.split(r'\s+-\s+Part|\s+Part', title)[0].strip()
+                series_name = _PART_SPLIT_RE.split(title)[0].strip()
                 series[series_name] += 1
             
-            # Pattern 3: "Series Name N"
-            match = re.match(r'(.+?)\s+\d+$', title)
-            if match:
-                series_name = match.group(1).strip()
-                series[series_name] += 1
+            # Pattern 3: "Series Name N" (only if 1/2 didn't already count it)
+            else:
+                match = _TRAILING_NUM_RE.match(title)
+                if match:
+                    series_name = match.group(1).strip()
+                    series[series_name] += 1
         
         return {k: v for k, v in series.most_common(20) if v >= 3}
     
-    def get_samples(self, num=10):
-        """Get representative samples"""
-        samples = []
+    def get_samples(self, num=10, rowids=None):
+        """Get representative samples: earliest 2, latest 2, then random sermons
         
-        # Earliest
-        self.cursor.execute(f"""
-            SELECT title, {self.transcript_col}
-            FROM {self.table_name}
-            WHERE {self.transcript_col} IS NOT NULL
-            ORDER BY id ASC LIMIT 2
-        """)
-        samples.extend(self.cursor.fetchall())
-        
-        # Latest
-        self.cursor.execute(f"""
-            SELECT title, {self.transcript_col}
-            FROM {self.table_name}
-            WHERE {self.transcript_col} IS NOT NULL
-            ORDER BY id DESC LIMIT 2
-        """)
-        samples.extend(self.cursor.fetchall())
-        
-        # Random
-        self.cursor.execute(f"""
-            SELECT title, {self.transcript_col}
-            FROM {self.table_name}
-            WHERE {self.transcript_col} IS NOT NULL
-            ORDER BY RANDOM() LIMIT {num - 4}
-        """)
-        samples.extend(self.cursor.fetchall())
+        rowids lists the rows that have a transcript (e.g. the cached get_transcript_rowids);
+        it is looked up when not given. Random rows are drawn from it exactly, so SQLite
+        does point lookups instead of sorting the whole table.
+        """
+        self.cursor.execute(self._sql_samples)
+        samples = self.cursor.fetchall()
+        
+        if rowids is None:
+            rowids = [row[0] for row in self.cursor.execute(self._sql_rowids)]
+        picked = random.sample(rowids, min(max(0, num - 4), len(rowids)))
+        
+        if picked:
+            self.cursor.execute(self._sql_picked_samples.format(picked=",".join("?" * len(picked))), picked)
+            # IN returns rows in rowid order; shuffle so the order is random too
+            picked_samples = self.cursor.fetchall()
+            random.shuffle(picked_samples)
+            samples.extend(picked_samples)
         
         return samples[:num]
 
+@st.cache_data(show_spinner=False, persist="disk")
+def compute_corpus_analysis(db_path, mtime, table_name, transcript_col):
+    """Whole-corpus stats, phrases, keywords and series, kept on disk per database file version"""
+    conn = sqlite3.connect(db_path)
+    try:
+        analyzer = ComprehensiveAnalyzer(conn, table_name, transcript_col)
+        return {
+            'basic_stats': analyzer.get_basic_stats(),
+            'phrase_frequencies': analyzer.find_all_phrases(),
+            'keywords': analyzer.count_keywords(),
+            'series': analyzer.detect_series()
+        }
+    finally:
+        conn.close()
+
 # ============================================================================
 # CONTEXT INSPECTOR
 # ============================================================================
@@ -468,32 +1261,31 @@ class ComprehensiveAnalyzer:
 def find_all_contexts(conn, table_name, transcript_col, search_term, context_chars=200):
     """Find ALL occurrences of a phrase with context (no sampling, no missing data)"""
     
+    # LIKE keeps every sermon containing the term anywhere (inside longer words too),
+    # the same substring match the scan below uses, so no occurrence is dropped
     cursor = conn.cursor()
     cursor.execute(f"""
         SELECT title, {transcript_col}
         FROM {table_name}
-        WHERE LOWER({transcript_col}) LIKE ?
+        WHERE {transcript_col} LIKE ?
     """, (f'%{search_term.lower()}%',))
     
+    search_lower = search_term.lower()
+    term_len = len(search_term)
+    
     results = []
-    for title, text in cursor.fetchall():
+    for title, text in iter_rows(cursor):
         if not text:
             continue
         
         text_lower = text.lower()
-        search_lower = search_term.lower()
         
         # Find ALL occurrences in this sermon
-        pos = 0
-        while True:
-            pos = text_lower.find(search_lower, pos)
-            if pos == -1:
-                break
-            
-            # Extract context
+        pos = text_lower.find(search_lower)
+        while pos != -1:
+            # Extract context (slicing clamps the end to the text length)
             start = max(0, pos - context_chars)
-            end = min(len(text), pos + len(search_term) + context_chars)
-            context = text[start:end].strip()
+            context = text[start:pos + term_len + context_chars].strip()
             
             results.append({
                 'title': title,
@@ -501,10 +1293,257 @@ def find_all_contexts(conn, table_name, transcript_col, search_term, context_cha
                 'position': pos
             })
             
-            pos += len(search_term)
+            pos = text_lower.find(search_lower, pos + term_len)
     
     return results
 
+# Theological terms pulled out of Ask Questions questions (in priority order)
+QUESTION_KEYWORDS = (
+    'god', 'holy spirit', 'scripture', 'salvation', 'spiritual warfare',
+    'prosperity', 'healing', 'end times', 'gifts', 'prayer', 'sin', 'holiness',
+    'suffering', 'prophets', 'prophecy', 'deliverance', 'demons', 'church',
+    'grace', 'works', 'faith', 'miracles', 'cross', 'atonement', 'curse'
+)
+
+# Search terms behind each Compare Teachers AI theme
+THEME_SEARCH_TERMS = {
+    "Gospel & Salvation": ["gospel", "salvation", "saved", "eternal life"],
+    "Money & Prosperity": ["money", "wealth", "prosperity", "blessing", "offering"],
+    "Holy Spirit & Power": ["holy spirit", "power", "anointing", "glory"],
+    "Sin & Redemption": ["sin", "redemption", "forgiveness", "repentance"],
+    "Healing & Deliverance": ["healing", "deliverance", "freedom", "breakthrough"],
+    "Prayer & Worship": ["prayer", "worship", "praise", "intercession"],
+    "Authority & Spiritual Warfare": ["authority", "spiritual warfare", "demons", "enemy"],
+    "Marriage & Family": ["marriage", "family", "children", "parenting"]
+}
+
+THEME_COMPARISON_PROMPT = """Compare how these two teachers/ministries approach "{theme}":
+
+{db1_name} - Sample teachings:
+{excerpts1}
+
+{db2_name} - Sample teachings:
+{excerpts2}
+
+Provide a structured comparison (300-400 words):
+
+1. **Main Theological Differences**: What are the core differences in their teaching on this theme?
+
+2. **Scripture Usage**: How do they use the Bible differently on this topic?
+
+3. **Practical Application**: How do their teachings apply to believers differently?
+
+4. **Red Flags** (if any): Any concerning theological issues?
+
+5. **Verdict**: Which approach is more biblically sound and why?
+
+Be objective, fair, and cite specific concerns."""
+
+# Total matching sermons plus the first 3 of them, each cut to the ±200-char
+# window around the term inside SQLite so only the excerpt reaches Python.
+# The count is a window over ids only; transcripts are read for the 3 samples.
+# Rows are (count, excerpt or NULL); no rows means no matches.
+# (params: lowercase term, LIKE pattern)
+EXCERPT_SQL = """
+    SELECT cnt, CASE WHEN p > 0 THEN substr(t, max(1, p - 200), p - max(1, p - 200) + 200) END
+    FROM (
+        SELECT m.cnt, s.{col} AS t, instr(LOWER(s.{col}), ?) AS p
+        FROM (
+            SELECT id, COUNT(*) OVER () AS cnt
+            FROM {table}
+            WHERE {col} LIKE ?
+            LIMIT 3
+        ) m
+        JOIN {table} s ON s.id = m.id
+    )
+"""
+
+# Series Builder prompts carry at most this much of each source sermon
+SERIES_SOURCE_CHARS = 15000
+
+SERIES_OUTLINE_PROMPT = """Create an outline for a {num_posts}-post blog series on "{topic}" for a {audience_lower} audience.
+
+Series Style: {style}
+Post Length: {post_length}
+
+Provide:
+1. Series title (compelling, clear)
+2. Series description (2-3 sentences)
+3. {num_posts} post titles that flow logically
+4. Brief description of what each post covers
+5. How the series builds/progresses
+
+Make it practical, hope-filled, and theologically sound."""
+
+# What a post does in the series: first, middle or last (a one-post series only introduces)
+SERIES_POST_ROLES = {
+    "first": "introduce the topic",
+    "middle": "build on previous posts",
+    "last": "conclude the series"
+}
+
+# How a post ends: every post but the last leads into the next
+SERIES_POST_ENDINGS = {
+    False: "Transition to next post",
+    True: "Powerful series conclusion"
+}
+
+# Sources go first, in their own prompt-cached block, so a post regenerated with
+# other settings (or another post over the same sermons) reuses the cached prefix
+SERIES_SOURCES_PROMPT = """SOURCE MATERIAL (Complete Sermons):
+{context}"""
+
+SERIES_POST_PROMPT = """Write Post {post_num} of {num_posts} in a series on "{topic}", using the source material above.
+
+TARGET AUDIENCE: {audience}
+SERIES STYLE: {style}
+TARGET LENGTH: {word_target} words
+
+REQUIREMENTS:
+1. This is post {post_num} of {num_posts} - {role}
+2. Use the complete sermon content to understand the full message arc
+3. Write in a warm, hopeful, {audience_lower} tone
+4. Include:
+   - Compelling introduction
+   - Clear h2/h3 section headers
+   - Biblical references
+   - Practical application
+   - {ending}
+5. Output clean HTML (h2, h3, p, ul, ol, blockquote only)
+6. Authentically reflect the source material's theology and tone
+
+Write Post {post_num}:"""
+
+@st.cache_resource(show_spinner=False)
+def get_term_automaton(terms):
+    """Aho-Corasick automaton over a tuple of lowercase terms (built once per term set)"""
+    automaton = ahocorasick.Automaton()
+    for term in terms:
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return automaton
+
+def iter_term_occurrences(text_lower, term):
+    """Yield (end, -length, position, term) for every occurrence of term, overlapping ones included"""
+    pos = text_lower.find(term)
+    while pos >= 0:
+        yield pos + len(term) - 1, -len(term), pos, term
+        pos = text_lower.find(term, pos + 1)
+
+def iter_term_hits(text_lower, terms, automaton=None):
+    """Yield (position, term) for every occurrence of any term in lowercased text
+
+    Hits come in order of where they end, longest first for a shared end, with
+    overlapping hits included - the automaton's order, which the fallback matches.
+    Worker threads pass an automaton built on the script thread (see get_term_automaton).
+    """
+    if AHOCORASICK_AVAILABLE:
+        for end, term in (automaton or get_term_automaton(terms)).iter(text_lower):
+            yield end - len(term) + 1, term
+    else:
+        for _, _, pos, term in heapq.merge(*(iter_term_occurrences(text_lower, term) for term in terms)):
+            yield pos, term
+
+def theme_search_terms(theme_terms):
+    """Every search term of a theme -> terms mapping, as the sorted tuple the term automaton is keyed on"""
+    return tuple(sorted({term for terms in theme_terms.values() for term in terms}))
+
+def collect_theme_excerpts(db_path, table_name, transcript_col, theme_terms, per_theme=3, context_chars=300,
+                           automaton=None):
+    """Collect up to per_theme excerpts for each theme in one pass over the matching sermons
+
+    theme_terms maps theme -> list of lowercase search terms.
+    Each sermon contributes at most one excerpt per theme.
+    Reads through its own read-only connection, so it can run on a worker thread; there,
+    pass automaton=get_term_automaton(theme_search_terms(theme_terms)) built on the script thread.
+    """
+    conn = open_readonly_connection(db_path)
+    try:
+        return _collect_theme_excerpts(conn, table_name, transcript_col, theme_terms, per_theme, context_chars,
+                                       automaton)
+    finally:
+        conn.close()
+
+def _collect_theme_excerpts(conn, table_name, transcript_col, theme_terms, per_theme, context_chars,
+                            automaton=None):
+    """collect_theme_excerpts' scan on an open connection"""
+    term_themes = {}
+    for theme, terms in theme_terms.items():
+        for term in terms:
+            term_themes.setdefault(term, []).append(theme)
+    terms = theme_search_terms(theme_terms)
+    
+    excerpts = {theme: [] for theme in theme_terms}
+    pending = set(theme_terms)
+    if not terms:
+        return excerpts
+    
+    # Shortlist sermons containing any term (substring, same as the hit scan below)
+    conditions = " OR ".join([f"{transcript_col} LIKE ?"] * len(terms))
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {transcript_col} FROM {table_name} WHERE {conditions}",
+        [f'%{term}%' for term in terms]
+    )
+    
+    for (text,) in iter_rows(cursor):
+        if not pending:
+            break
+        
+        used = set()
+        for pos, term in iter_term_hits(text.lower(), terms, automaton):
+            for theme in term_themes[term]:
+                if theme in pending and theme not in used:
+                    used.add(theme)
+                    start = max(0, pos - context_chars)
+                    excerpts[theme].append(text[start:pos + context_chars])
+                    if len(excerpts[theme]) >= per_theme:
+                        pending.discard(theme)
+            if not pending or used >= pending:
+                break
+    
+    return excerpts
+
+def search_series_sources(db_path, table_name, transcript_col, index_path, search_terms, limit):
+    """Best-matching sermons for a Series Builder topic as (title, text) pairs, text trimmed to the prompt budget
+
+    Ranked by BM25 through the sidecar index at index_path (see ensure_fts_index), or the
+    longest LIKE matches when there is no usable index. Reads through its own read-only
+    connections, so searches can run on worker threads.
+    """
+    if index_path and all(re.search(r'\w', term) for term in search_terms):
+        conn = open_fts_search(index_path, db_path)
+        try:
+            cursor = conn.execute(f"""
+                SELECT t.title, substr(t.{transcript_col}, 1, ?)
+                FROM {FTS_INDEX_TABLE} f
+                JOIN src.{table_name} t ON t.id = f.rowid
+                WHERE {FTS_INDEX_TABLE} MATCH ?
+                ORDER BY bm25({FTS_INDEX_TABLE})
+                LIMIT ?
+            """, (SERIES_SOURCE_CHARS, " OR ".join(fts_phrase_query(term) for term in search_terms), limit))
+            return [(title, text) for title, text in iter_rows(cursor) if text]
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+    
+    # Longest matches first, as the original search did
+    conn = open_readonly_connection(db_path)
+    try:
+        conditions = [f"{transcript_col} LIKE ?" for _ in search_terms]
+        cursor = conn.execute(f"""
+            SELECT title, substr({transcript_col}, 1, ?)
+            FROM {table_name}
+            WHERE ({' OR '.join(conditions)})
+            AND {transcript_col} IS NOT NULL
+            ORDER BY LENGTH({transcript_col}) DESC
+            LIMIT ?
+        """, [SERIES_SOURCE_CHARS] + [f'%{term}%' for term in search_terms] + [limit])
+        return [(title, text) for title, text in iter_rows(cursor) if text]
+    finally:
+        conn.close()
+
 # ============================================================================
 # FABRIC-STYLE FORMATTING
 # ============================================================================
@@ -520,26 +1559,15 @@ st.markdown("*Complete analysis system - no sampling, no missing data*")
 with st.sidebar:
     st.header("⚙️ Settings")
     
-    # Auto-detect available databases
-    db_options = []
-    
-    # Check uploads folder
-    upload_dbs = list(Path("/mnt/user-data/uploads").glob("*.db"))
-    db_options.extend([str(db) for db in upload_dbs])
-    
-    # Check current directory
-    local_dbs = list(Path(".").glob("*.db"))
-    db_options.extend([str(db) for db in local_dbs])
-    
-    # Remove duplicates and sort
-    db_options = sorted(list(set(db_options)))
+    # Auto-detect available databases (uploads folder and current directory)
+    db_options = sorted(list_db_files(DB_SEARCH_DIRS))
     
     if db_options:
         # Dropdown selector
         db_path = st.selectbox(
             "📁 Select Database:",
             options=db_options,
-            format_func=lambda x: Path(x).name
+            format_func=os.path.basename
         )
     else:
         st.warning("⚠️ No databases found. Upload or specify path:")
@@ -561,23 +1589,7 @@ conn, table_name, transcript_col = get_db_connection(db_path)
 if conn:
     # CONTAMINATION CHECK
     cursor = conn.cursor()
-    cursor.execute(f"SELECT title FROM {table_name}")
-    all_titles = [row[0] for row in cursor.fetchall()]
-    
-    # Quick contamination scan
-    contamination_keywords = [
-        'elon musk', 'grok', 'openai', 'chatgpt',
-        'justin peters', 'community bible church',
-        'trailer', 'movie clip', 'full album'
-    ]
-    
-    contaminated = []
-    for title in all_titles:
-        title_lower = title.lower()
-        for keyword in contamination_keywords:
-            if keyword in title_lower:
-                contaminated.append(title)
-                break
+    contaminated, _ = scan_contamination(db_path, Path(db_path).stat().st_mtime, table_name)
     
     if contaminated:
         st.error(f"⚠️ CONTAMINATION DETECTED: {len(contaminated)} non-sermon videos found!")
@@ -621,25 +1633,24 @@ if conn:
         
         if st.button("🚀 Run Quick Survey", type="primary"):
             with st.spinner("Analyzing 5 random samples..."):
+                # Pick the rows in Python and truncate in SQLite (no full-table sort)
+                rowids = get_transcript_rowids(db_path, Path(db_path).stat().st_mtime, table_name, transcript_col)
+                picked = random.sample(rowids, min(5, len(rowids)))
                 cursor = conn.cursor()
                 cursor.execute(f'''
-                    SELECT {transcript_col} FROM {table_name}
-                    WHERE {transcript_col} IS NOT NULL
-                    ORDER BY RANDOM() LIMIT 5
-                ''')
+                    SELECT substr({transcript_col}, 1, 2000) FROM {table_name}
+                    WHERE rowid IN ({",".join("?" * len(picked))})
+                ''', picked)
                 
-                samples = [row[0][:2000] for row in cursor.fetchall()]
+                samples = [row[0] for row in cursor]
                 combined = "\n\n---\n\n".join(samples)
                 
                 try:
-                    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+                    st.markdown("### 📊 Quick Analysis")
                     
-                    message = client.messages.create(
-                        model="claude-sonnet-4-20250514",
-                        max_tokens=2000,
-                        messages=[{
-                            "role": "user",
-                            "content": f"""Analyze these sermon samples and provide a quick theological profile:
+                    stream_claude_reply(
+                        st.empty(),
+                        f"""Analyze these sermon samples and provide a quick theological profile:
 
 {combined}
 
@@ -656,13 +1667,10 @@ Provide:
 
 Format: "The phrase '[exact quote]' suggests..." NOT "Sample 1 shows..."
 
-Be specific with quoted evidence."""
-                        }]
+Be specific with quoted evidence.""",
+                        max_tokens=2000
                     )
                     
-                    st.markdown("### 📊 Quick Analysis")
-                    st.markdown(message.content[0].text)
-                    
                     st.info("💡 For comprehensive analysis, use the 'Deep Analysis' tab")
                     
                 except Exception as e:
@@ -685,24 +1693,21 @@ Be specific with quoted evidence."""
                 progress = st.progress(0)
                 status = st.empty()
                 
-                status.text("📊 Gathering statistics...")
-                basic_stats = analyzer.get_basic_stats()
-                progress.progress(20)
-                
-                status.text("🔍 Analyzing phrases...")
-                phrases = analyzer.find_all_phrases()
-                progress.progress(40)
-                
-                status.text("📝 Counting keywords...")
-                keywords = analyzer.count_keywords()
-                progress.progress(60)
-                
-                status.text("📚 Detecting series...")
-                series = analyzer.detect_series()
+                status.text("📊 Analyzing phrases, keywords and series...")
+                corpus = compute_corpus_analysis(
+                    db_path, Path(db_path).stat().st_mtime, table_name, transcript_col
+                )
+                basic_stats = corpus['basic_stats']
+                phrases = corpus['phrase_frequencies']
+                keywords = corpus['keywords']
+                series = corpus['series']
                 progress.progress(80)
                 
+                # Samples stay random on every run (cheap rowid lookups)
                 status.text("📄 Selecting samples...")
-                samples = analyzer.get_samples()
+                samples = analyzer.get_samples(rowids=get_transcript_rowids(
+                    db_path, Path(db_path).stat().st_mtime, table_name, transcript_col
+                ))
                 progress.progress(90)
                 
                 analysis = {
@@ -716,35 +1721,36 @@ Be specific with quoted evidence."""
                 status.text("🤖 Sending to Claude...")
                 
                 # Format for Claude
-                analysis_text = f"""# COMPREHENSIVE CORPUS ANALYSIS
+                report = io.StringIO()
+                report.write(f"""# COMPREHENSIVE CORPUS ANALYSIS
 
 ## Statistics
 - Total Sermons: {basic_stats['total_sermons']:,}
 - Total Words: {basic_stats['total_words']:,}
 
 ## Top Phrases
-"""
-                for phrase, count in list(phrases.items())[:20]:
-                    analysis_text += f"- {phrase}: {count:,}\n"
+""")
+                for phrase, count in islice(phrases.items(), 20):
+                    report.write(f"- {phrase}: {count:,}\n")
                 
-                analysis_text += "\n## Keywords\n"
-                for keyword, count in list(keywords.items())[:20]:
-                    analysis_text += f"- {keyword}: {count:,}\n"
+                report.write("\n## Keywords\n")
+                report.write(f"({ComprehensiveAnalyzer.COUNT_NOTE})\n")
+                for keyword, count in islice(keywords.items(), 20):
+                    report.write(f"- {keyword}: {count:,}\n")
                 
-                analysis_text += "\n## Samples\n"
+                report.write("\n## Samples\n")
                 for i, (title, text) in enumerate(samples[:3], 1):
-                    analysis_text += f"\n### {i}. {title}\n{text[:1500]}...\n"
+                    report.write(f"\n### {i}. {title}\n{text[:1500]}...\n")
+                
+                analysis_text = report.getvalue()
                 
                 # Get evaluation
                 try:
-                    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-                    
-                    message = client.messages.create(
-                        model="claude-sonnet-4-20250514",
-                        max_tokens=3000,
-                        messages=[{
-                            "role": "user",
-                            "content": f"""{analysis_text}
+                    # Stream the evaluation so it shows up while Claude is still writing
+                    evaluation_box = st.empty()
+                    evaluation = stream_claude_reply(
+                        evaluation_box,
+                        f"""{analysis_text}
 
 CRITICAL INSTRUCTIONS FOR THEOLOGICAL ASSESSMENT:
 
@@ -780,11 +1786,10 @@ Cite frequencies that show orthodox markers:
 - Overall verdict
 - Safe for what?
 - Watch for what?
-- Next steps with specific Context Inspector searches"""
-                        }]
+- Next steps with specific Context Inspector searches""",
+                        max_tokens=3000
                     )
-                    
-                    evaluation = message.content[0].text
+                    evaluation_box.empty()
                     
                     progress.progress(100)
                     status.text("✅ Complete!")
@@ -802,12 +1807,13 @@ Cite frequencies that show orthodox markers:
                     st.json(analysis['basic_stats'])
                     
                     st.markdown("### 🔍 Top Phrases")
-                    for phrase, count in list(analysis['phrase_frequencies'].items())[:20]:
+                    for phrase, count in islice(analysis['phrase_frequencies'].items(), 20):
                         st.write(f"- **{phrase}**: {count:,} times")
                     
                     st.markdown("### 📝 Top Keywords")
-                    for keyword, count in list(analysis['keywords'].items())[:20]:
+                    for keyword, count in islice(analysis['keywords'].items(), 20):
                         st.write(f"- **{keyword}**: {count:,} times")
+                    st.caption(ComprehensiveAnalyzer.COUNT_NOTE)
                     
                     st.markdown("### 🤖 Theological Evaluation")
                     st.markdown(evaluation)
@@ -816,7 +1822,8 @@ Cite frequencies that show orthodox markers:
                     st.markdown("---")
                     st.markdown("### 📋 Complete Report (Copy This)")
                     
-                    full_text = f"""# COMPREHENSIVE THEOLOGICAL ANALYSIS
+                    report = io.StringIO()
+                    report.write(f"""# COMPREHENSIVE THEOLOGICAL ANALYSIS
 Database: {Path(db_path).stem}
 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
@@ -827,20 +1834,22 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - Date Range: {analysis['basic_stats']['date_range']}
 
 ## TOP PHRASE FREQUENCIES
-"""
-                    for phrase, count in list(analysis['phrase_frequencies'].items())[:20]:
-                        full_text += f"- {phrase}: {count:,} times\n"
+""")
+                    for phrase, count in islice(analysis['phrase_frequencies'].items(), 20):
+                        report.write(f"- {phrase}: {count:,} times\n")
                     
-                    full_text += "\n## THEOLOGICAL KEYWORDS\n"
-                    for keyword, count in list(analysis['keywords'].items())[:20]:
-                        full_text += f"- {keyword}: {count:,} times\n"
+                    report.write("\n## THEOLOGICAL KEYWORDS\n")
+                    report.write(f"({ComprehensiveAnalyzer.COUNT_NOTE})\n")
+                    for keyword, count in islice(analysis['keywords'].items(), 20):
+                        report.write(f"- {keyword}: {count:,} times\n")
                     
                     if analysis.get('series'):
-                        full_text += "\n## MAJOR SERMON SERIES\n"
-                        for series, count in list(analysis['series'].items())[:10]:
-                            full_text += f"- {series}: {count} sermons\n"
+                        report.write("\n## MAJOR SERMON SERIES\n")
+                        for series, count in islice(analysis['series'].items(), 10):
+                            report.write(f"- {series}: {count} sermons\n")
                     
-                    full_text += f"\n## THEOLOGICAL EVALUATION\n\n{evaluation}\n"
+                    report.write(f"\n## THEOLOGICAL EVALUATION\n\n{evaluation}\n")
+                    full_text = report.getvalue()
                     
                     st.text_area("📋 Copy This Complete Report", full_text, height=400)
                     
@@ -910,147 +1919,110 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         )
         
         if db2_file:
-            # Save uploaded file temporarily
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
-                tmp.write(db2_file.read())
-                db2_path = tmp.name
-            
             try:
-                # Connect to second database
-                conn2 = sqlite3.connect(db2_path)
-                
-                # Detect schema
+                # Saved and opened once per uploaded file, then reused across reruns
+                db2_path, conn2, table2, col2 = open_uploaded_db(db2_file.getvalue())
                 cursor2 = conn2.cursor()
-                cursor2.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND (name='transcripts' OR name='video_transcripts')
-                """)
-                result = cursor2.fetchone()
                 
-                if not result:
-                    st.error("No valid table found in second database")
+                if not table2:
+                    st.error("No valid transcripts table found in second database")
                 else:
-                    table2 = result[0]
+                    st.success(f"✅ Second database loaded: {db2_file.name}")
                     
-                    cursor2.execute(f"PRAGMA table_info({table2})")
-                    columns = [col[1] for col in cursor2.fetchall()]
+                    # Get stats for Database 1 (current database)
+                    total_count1, total_words1 = get_corpus_stats(
+                        conn, (db_path, Path(db_path).stat().st_mtime), table_name, transcript_col
+                    )
                     
-                    if 'transcript_text' in columns:
-                        col2 = 'transcript_text'
-                    elif 'transcript' in columns:
-                        col2 = 'transcript'
-                    else:
-                        st.error("No transcript column found")
-                        col2 = None
+                    # Get stats for Database 2 (uploaded database, path named by content hash)
+                    total_count2, total_words2 = get_corpus_stats(conn2, (db2_path,), table2, col2)
                     
-                    if col2:
-                        st.success(f"✅ Second database loaded: {db2_file.name}")
-                        
-                        # Get stats for Database 1 (current database)
-                        cursor1 = conn.cursor()
-                        cursor1.execute(f"""
-                            SELECT COUNT(*), SUM(LENGTH({transcript_col}))
-                            FROM {table_name}
-                            WHERE {transcript_col} IS NOT NULL
-                        """)
-                        total_count1, chars1 = cursor1.fetchone()
-                        total_words1 = chars1 // 5 if chars1 else 0
-                        
-                        # Get stats for Database 2 (uploaded database)
-                        cursor2.execute(f"""
-                            SELECT COUNT(*), SUM(LENGTH({col2}))
-                            FROM {table2}
-                            WHERE {col2} IS NOT NULL
-                        """)
-                        total_count2, chars2 = cursor2.fetchone()
-                        total_words2 = chars2 // 5 if chars2 else 0
-                        
-                        # Names
+                    # Names (in a form so typing doesn't rerun the page per keystroke)
+                    with st.form("compare_names"):
                         col1, col2_display = st.columns(2)
                         with col1:
                             db1_name = st.text_input("Database 1 Name", value="Teacher 1", key='db1_name')
                         with col2_display:
                             db2_name = st.text_input("Database 2 Name", value="Teacher 2", key='db2_name')
+                        st.form_submit_button("Apply Names")
+                    
+                    # Show stats
+                    st.markdown("### 📊 Database Statistics")
+                    
+                    stats_col1, stats_col2 = st.columns(2)
+                    
+                    with stats_col1:
+                        st.metric(f"{db1_name} - Total Sermons", total_count1)
+                        st.metric(f"{db1_name} - Total Words", f"{total_words1:,}")
+                    
+                    with stats_col2:
+                        st.metric(f"{db2_name} - Total Sermons", total_count2)
+                        st.metric(f"{db2_name} - Total Words", f"{total_words2:,}")
+                    
+                    # Comparison options
+                    st.markdown("---")
+                    st.subheader("Step 2: Choose Comparison Type")
+                    
+                    comparison_type = st.radio(
+                        "What would you like to compare?",
+                        [
+                            "🎯 Specific Topics (Keyword Comparison)",
+                            "📊 Theological Themes (AI Analysis)",
+                            "🔍 Custom Search Terms"
+                        ],
+                        key='comparison_type'
+                    )
+                    
+                    # ================================================================
+                    # SPECIFIC TOPICS COMPARISON
+                    # ================================================================
+                    
+                    if comparison_type == "🎯 Specific Topics (Keyword Comparison)":
+                        st.markdown("### Compare Specific Topics")
                         
-                        # Show stats
-                        st.markdown("### 📊 Database Statistics")
-                        
-                        stats_col1, stats_col2 = st.columns(2)
-                        
-                        with stats_col1:
-                            st.metric(f"{db1_name} - Total Sermons", total_count1)
-                            st.metric(f"{db1_name} - Total Words", f"{total_words1:,}")
-                        
-                        with stats_col2:
-                            st.metric(f"{db2_name} - Total Sermons", total_count2)
-                            st.metric(f"{db2_name} - Total Words", f"{total_words2:,}")
-                        
-                        # Comparison options
-                        st.markdown("---")
-                        st.subheader("Step 2: Choose Comparison Type")
-                        
-                        comparison_type = st.radio(
-                            "What would you like to compare?",
+                        # Preset topic sets
+                        topic_preset = st.selectbox(
+                            "Choose preset topics or create custom",
                             [
-                                "🎯 Specific Topics (Keyword Comparison)",
-                                "📊 Theological Themes (AI Analysis)",
-                                "🔍 Custom Search Terms"
+                                "Custom",
+                                "Prosperity Gospel Red Flags",
+                                "Inner Healing Approaches", 
+                                "Money & Giving Teaching",
+                                "Holy Spirit & Power",
+                                "Grace vs. Works",
+                                "Sexual Purity Topics"
                             ],
-                            key='comparison_type'
+                            key='topic_preset'
                         )
                         
-                        # ================================================================
-                        # SPECIFIC TOPICS COMPARISON
-                        # ================================================================
+                        # Define preset topics
+                        presets = {
+                            "Prosperity Gospel Red Flags": [
+                                "seed offering", "sow and reap", "financial blessing",
+                                "breakthrough offering", "prosperity", "wealth transfer"
+                            ],
+                            "Inner Healing Approaches": [
+                                "inner healing", "soul wounds", "trauma", "attachment",
+                                "healing memories", "deliverance"
+                            ],
+                            "Money & Giving Teaching": [
+                                "tithe", "offering", "giving", "money", "wealth", "prosperity"
+                            ],
+                            "Holy Spirit & Power": [
+                                "holy spirit", "power", "anointing", "glory", "presence",
+                                "manifestation"
+                            ],
+                            "Grace vs. Works": [
+                                "grace", "works", "faith", "righteousness", "justification",
+                                "sanctification"
+                            ],
+                            "Sexual Purity Topics": [
+                                "addiction", "purity", "sexual", "lust", "pornography",
+                                "accountability"
+                            ]
+                        }
                         
-                        if comparison_type == "🎯 Specific Topics (Keyword Comparison)":
-                            st.markdown("### Compare Specific Topics")
-                            
-                            # Preset topic sets
-                            topic_preset = st.selectbox(
-                                "Choose preset topics or create custom",
-                                [
-                                    "Custom",
-                                    "Prosperity Gospel Red Flags",
-                                    "Inner Healing Approaches", 
-                                    "Money & Giving Teaching",
-                                    "Holy Spirit & Power",
-                                    "Grace vs. Works",
-                                    "Sexual Purity Topics"
-                                ],
-                                key='topic_preset'
-                            )
-                            
-                            # Define preset topics
-                            presets = {
-                                "Prosperity Gospel Red Flags": [
-                                    "seed offering", "sow and reap", "financial blessing",
-                                    "breakthrough offering", "prosperity", "wealth transfer"
-                                ],
-                                "Inner Healing Approaches": [
-                                    "inner healing", "soul wounds", "trauma", "attachment",
-                                    "healing memories", "deliverance"
-                                ],
-                                "Money & Giving Teaching": [
-                                    "tithe", "offering", "giving", "money", "wealth", "prosperity"
-                                ],
-                                "Holy Spirit & Power": [
-                                    "holy spirit", "power", "anointing", "glory", "presence",
-                                    "manifestation"
-                                ],
-                                "Grace vs. Works": [
-                                    "grace", "works", "faith", "righteousness", "justification",
-                                    "sanctification"
-                                ],
-                                "Sexual Purity Topics": [
-                                    "addiction", "purity", "sexual", "lust", "pornography",
-                                    "accountability"
-                                ]
-                            }
-                            
+                        with st.form("topic_comparison"):
                             if topic_preset != "Custom":
                                 topics = presets[topic_preset]
                                 st.info(f"Searching for: {', '.join(topics)}")
@@ -1063,309 +2035,204 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                                 )
                                 topics = [t.strip() for t in topics_input.split('\n') if t.strip()]
                             
-                            if st.button("🔍 Run Comparison", type="primary", key='run_topic_comparison'):
-                                with st.spinner("Analyzing both databases..."):
-                                    results = []
-                                    
-                                    for topic in topics:
-                                        # Search database 1
-                                        cursor.execute(f"""
-                                            SELECT COUNT(*)
-                                            FROM {table_name}
-                                            WHERE LOWER({transcript_col}) LIKE ?
-                                        """, (f'%{topic.lower()}%',))
-                                        count1 = cursor.fetchone()[0]
-                                        
-                                        # Search database 2  
-                                        cursor2.execute(f"""
-                                            SELECT COUNT(*)
-                                            FROM {table2}
-                                            WHERE LOWER({col2}) LIKE ?
-                                        """, (f'%{topic.lower()}%',))
-                                        count2_val = cursor2.fetchone()[0]
-                                        
-                                        # Calculate percentages
-                                        pct1 = (count1 / total_count1 * 100) if total_count1 > 0 else 0
-                                        pct2 = (count2_val / total_count2 * 100) if total_count2 > 0 else 0
-                                        
-                                        results.append({
-                                            'Topic': topic.title(),
-                                            f'{db1_name} Count': count1,
-                                            f'{db1_name} %': f"{pct1:.1f}%",
-                                            f'{db2_name} Count': count2_val,
-                                            f'{db2_name} %': f"{pct2:.1f}%",
-                                            'Difference': count1 - count2_val
-                                        })
-                                    
-                                    # Display results
-                                    st.markdown("### 📊 Comparison Results")
-                                    df = pd.DataFrame(results)
-                                    st.dataframe(df, use_container_width=True)
-                                    
-                                    # Visualization
-                                    st.markdown("### 📈 Visual Comparison")
-                                    
-                                    # Bar chart
-                                    chart_data = pd.DataFrame({
-                                        db1_name: [r[f'{db1_name} Count'] for r in results],
-                                        db2_name: [r[f'{db2_name} Count'] for r in results],
-                                    }, index=[r['Topic'] for r in results])
-                                    
-                                    st.bar_chart(chart_data)
-                                    
-                                    # Highlights
-                                    st.markdown("### 💡 Key Differences")
-                                    
-                                    # Find biggest differences
-                                    sorted_results = sorted(results, key=lambda x: abs(x['Difference']), reverse=True)
-                                    
-                                    for r in sorted_results[:3]:
-                                        if r['Difference'] > 0:
-                                            st.success(f"**{r['Topic']}**: {db1_name} emphasizes this more ({r[f'{db1_name} Count']} vs {r[f'{db2_name} Count']} mentions)")
-                                        elif r['Difference'] < 0:
-                                            st.info(f"**{r['Topic']}**: {db2_name} emphasizes this more ({r[f'{db2_name} Count']} vs {r[f'{db1_name} Count']} mentions)")
+                            run_topics = st.form_submit_button("🔍 Run Comparison", type="primary")
                         
-                        # ================================================================
-                        # THEOLOGICAL THEMES COMPARISON
-                        # ================================================================
+                        if run_topics:
+                            with st.spinner("Analyzing both databases..."):
+                                # One query per database for all topics
+                                counts1 = pd.Series(count_sermons_matching(conn, table_name, transcript_col, topics), dtype="int64")
+                                counts2 = pd.Series(count_sermons_matching(conn2, table2, col2, topics), dtype="int64")
+                                
+                                # Calculate percentages column-wise
+                                pct1 = counts1 / total_count1 * 100 if total_count1 > 0 else counts1 * 0.0
+                                pct2 = counts2 / total_count2 * 100 if total_count2 > 0 else counts2 * 0.0
+                                difference = counts1 - counts2
+                                
+                                topic_titles = [topic.title() for topic in topics]
+                                
+                                # Display results
+                                st.markdown("### 📊 Comparison Results")
+                                df = pd.DataFrame({
+                                    'Topic': topic_titles,
+                                    f'{db1_name} Count': counts1,
+                                    f'{db1_name} %': pct1.map("{:.1f}%".format),
+                                    f'{db2_name} Count': counts2,
+                                    f'{db2_name} %': pct2.map("{:.1f}%".format),
+                                    'Difference': difference
+                                })
+                                st.dataframe(df, use_container_width=True)
+                                st.caption("Counts are sermons whose text contains the topic (case-insensitive, including inside longer words).")
+                                
+                                # Visualization
+                                st.markdown("### 📈 Visual Comparison")
+                                
+                                # Bar chart
+                                chart_data = pd.DataFrame({
+                                    db1_name: counts1.values,
+                                    db2_name: counts2.values,
+                                }, index=topic_titles)
+                                
+                                st.bar_chart(chart_data)
+                                
+                                # Highlights
+                                st.markdown("### 💡 Key Differences")
+                                
+                                # Find biggest differences
+                                for i in difference.abs().nlargest(3).index:
+                                    if difference[i] > 0:
+                                        st.success(f"**{topic_titles[i]}**: {db1_name} emphasizes this more ({counts1[i]} vs {counts2[i]} mentions)")
+                                    elif difference[i] < 0:
+                                        st.info(f"**{topic_titles[i]}**: {db2_name} emphasizes this more ({counts2[i]} vs {counts1[i]} mentions)")
+                    
+                    # ================================================================
+                    # THEOLOGICAL THEMES COMPARISON
+                    # ================================================================
+                    
+                    elif comparison_type == "📊 Theological Themes (AI Analysis)":
+                        st.markdown("### AI-Powered Theological Comparison")
+                        st.info("Uses Claude AI to analyze theological differences across major themes")
                         
-                        elif comparison_type == "📊 Theological Themes (AI Analysis)":
-                            st.markdown("### AI-Powered Theological Comparison")
-                            st.info("Uses Claude AI to analyze theological differences across major themes")
-                            
+                        with st.form("theme_comparison"):
                             theme_options = st.multiselect(
                                 "Select themes to analyze (max 3 for better quality)",
-                                [
-                                    "Gospel & Salvation",
-                                    "Money & Prosperity",
-                                    "Holy Spirit & Power",
-                                    "Sin & Redemption",
-                                    "Healing & Deliverance",
-                                    "Prayer & Worship",
-                                    "Authority & Spiritual Warfare",
-                                    "Marriage & Family"
-                                ],
+                                list(THEME_SEARCH_TERMS),
                                 default=["Gospel & Salvation", "Money & Prosperity"],
                                 max_selections=3,
                                 key='theme_options'
                             )
                             
-                            if st.button("🤖 Generate AI Comparison", type="primary", key='ai_comparison'):
-                                if not theme_options:
-                                    st.warning("Please select at least one theme")
-                                else:
-                                    for theme in theme_options:
-                                        with st.expander(f"📖 {theme}", expanded=True):
-                                            with st.spinner(f"Analyzing {theme}..."):
-                                                # Get sample sermons from both databases
-                                                search_terms = {
-                                                    "Gospel & Salvation": ["gospel", "salvation", "saved", "eternal life"],
-                                                    "Money & Prosperity": ["money", "wealth", "prosperity", "blessing", "offering"],
-                                                    "Holy Spirit & Power": ["holy spirit", "power", "anointing", "glory"],
-                                                    "Sin & Redemption": ["sin", "redemption", "forgiveness", "repentance"],
-                                                    "Healing & Deliverance": ["healing", "deliverance", "freedom", "breakthrough"],
-                                                    "Prayer & Worship": ["prayer", "worship", "praise", "intercession"],
-                                                    "Authority & Spiritual Warfare": ["authority", "spiritual warfare", "demons", "enemy"],
-                                                    "Marriage & Family": ["marriage", "family", "children", "parenting"]
-                                                }
-                                                
-                                                terms = search_terms.get(theme, [theme.lower()])
-                                                
-                                                # Get excerpts from DB1
-                                                excerpts1 = []
-                                                for term in terms:
-                                                    cursor.execute(f"""
-                                                        SELECT {transcript_col}
-                                                        FROM {table_name}
-                                                        WHERE LOWER({transcript_col}) LIKE ?
-                                                        LIMIT 2
-                                                    """, (f'%{term}%',))
-                                                    for (text,) in cursor.fetchall():
-                                                        if text:
-                                                            pos = text.lower().find(term)
-                                                            if pos >= 0:
-                                                                start = max(0, pos - 300)
-                                                                end = min(len(text), pos + 300)
-                                                                excerpts1.append(text[start:end])
-                                                    if len(excerpts1) >= 3:
-                                                        break
-                                                
-                                                # Get excerpts from DB2
-                                                excerpts2 = []
-                                                for term in terms:
-                                                    cursor2.execute(f"""
-                                                        SELECT {col2}
-                                                        FROM {table2}
-                                                        WHERE LOWER({col2}) LIKE ?
-                                                        LIMIT 2
-                                                    """, (f'%{term}%',))
-                                                    for (text,) in cursor2.fetchall():
-                                                        if text:
-                                                            pos = text.lower().find(term)
-                                                            if pos >= 0:
-                                                                start = max(0, pos - 300)
-                                                                end = min(len(text), pos + 300)
-                                                                excerpts2.append(text[start:end])
-                                                    if len(excerpts2) >= 3:
-                                                        break
-                                                
-                                                # AI Comparison
-                                                if excerpts1 and excerpts2:
-                                                    try:
-                                                        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-                                                        
-                                                        prompt = f"""Compare how these two teachers/ministries approach "{theme}":
-
-{db1_name} - Sample teachings:
-{chr(10).join([f"• {e[:400]}" for e in excerpts1[:3]])}
-
-{db2_name} - Sample teachings:
-{chr(10).join([f"• {e[:400]}" for e in excerpts2[:3]])}
-
-Provide a structured comparison (300-400 words):
-
-1. **Main Theological Differences**: What are the core differences in their teaching on this theme?
-
-2. **Scripture Usage**: How do they use the Bible differently on this topic?
-
-3. **Practical Application**: How do their teachings apply to believers differently?
-
-4. **Red Flags** (if any): Any concerning theological issues?
-
-5. **Verdict**: Which approach is more biblically sound and why?
-
-Be objective, fair, and cite specific concerns."""
-
-                                                        message = client.messages.create(
-                                                            model="claude-sonnet-4-20250514",
-                                                            max_tokens=1500,
-                                                            messages=[{"role": "user", "content": prompt}]
-                                                        )
-                                                        
-                                                        st.markdown(message.content[0].text)
-                                                        
-                                                        # Show sample excerpts
-                                                        with st.expander("📄 View sample excerpts used"):
-                                                            st.markdown(f"**{db1_name}:**")
-                                                            for e in excerpts1[:2]:
-                                                                st.text(e[:300] + "...")
-                                                            st.markdown(f"**{db2_name}:**")
-                                                            for e in excerpts2[:2]:
-                                                                st.text(e[:300] + "...")
-                                                    
-                                                    except Exception as e:
-                                                        st.error(f"AI comparison failed: {str(e)}")
-                                                else:
-                                                    st.warning(f"Not enough content found for {theme}")
+                            run_themes = st.form_submit_button("🤖 Generate AI Comparison", type="primary")
                         
-                        # ================================================================
-                        # CUSTOM SEARCH COMPARISON
-                        # ================================================================
+                        if run_themes:
+                            if not theme_options:
+                                st.warning("Please select at least one theme")
+                            else:
+                                theme_terms = {
+                                    theme: THEME_SEARCH_TERMS.get(theme, [theme.lower()])
+                                    for theme in theme_options
+                                }
+                                
+                                # Gather sample excerpts for every theme in one pass per database,
+                                # both databases at once (SQLite releases the GIL while reading)
+                                # (the term automaton is built here: workers have no script context)
+                                with st.spinner("Collecting sample teachings..."):
+                                    automaton = get_term_automaton(theme_search_terms(theme_terms)) if AHOCORASICK_AVAILABLE else None
+                                    with ThreadPoolExecutor(max_workers=2) as pool:
+                                        future1 = pool.submit(collect_theme_excerpts, db_path, table_name, transcript_col, theme_terms, automaton=automaton)
+                                        future2 = pool.submit(collect_theme_excerpts, db2_path, table2, col2, theme_terms, automaton=automaton)
+                                        found1, found2 = future1.result(), future2.result()
+                                theme_data = [(theme, found1[theme], found2[theme]) for theme in theme_options]
+                                
+                                # Themes with content on both sides get a prompt
+                                prompts = []
+                                for theme, excerpts1, excerpts2 in theme_data:
+                                    if excerpts1 and excerpts2:
+                                        prompts.append(THEME_COMPARISON_PROMPT.format(
+                                            theme=theme,
+                                            db1_name=db1_name,
+                                            excerpts1="\n".join(f"• {e[:400]}" for e in excerpts1[:3]),
+                                            db2_name=db2_name,
+                                            excerpts2="\n".join(f"• {e[:400]}" for e in excerpts2[:3])
+                                        ))
+                                
+                                # All theme comparisons run concurrently
+                                replies = []
+                                if prompts:
+                                    with st.spinner(f"Analyzing {len(prompts)} theme(s)..."):
+                                        try:
+                                            replies = run_claude_prompts(prompts)
+                                        except Exception as e:
+                                            st.error(f"AI comparison failed: {str(e)}")
+                                replies = iter(replies)
+                                
+                                for theme, excerpts1, excerpts2 in theme_data:
+                                    with st.expander(f"📖 {theme}", expanded=True):
+                                        if excerpts1 and excerpts2:
+                                            reply = next(replies, None)
+                                            if reply is None:
+                                                continue
+                                            if isinstance(reply, Exception):
+                                                st.error(f"AI comparison failed: {str(reply)}")
+                                                continue
+                                            
+                                            st.markdown(reply)
+                                            
+                                            # Show sample excerpts
+                                            with st.expander("📄 View sample excerpts used"):
+                                                st.markdown(f"**{db1_name}:**")
+                                                for e in excerpts1[:2]:
+                                                    st.text(e[:300] + "...")
+                                                st.markdown(f"**{db2_name}:**")
+                                                for e in excerpts2[:2]:
+                                                    st.text(e[:300] + "...")
+                                        else:
+                                            st.warning(f"Not enough content found for {theme}")
+                    
+                    # ================================================================
+                    # CUSTOM SEARCH COMPARISON
+                    # ================================================================
+                    
+                    elif comparison_type == "🔍 Custom Search Terms":
+                        st.markdown("### Custom Search Comparison")
                         
-                        elif comparison_type == "🔍 Custom Search Terms":
-                            st.markdown("### Custom Search Comparison")
-                            
+                        with st.form("custom_search_form"):
                             custom_search = st.text_input(
                                 "Enter search term or phrase",
                                 placeholder="e.g., 'seed offering' or 'glory cloud'",
                                 key='custom_search'
                             )
                             
-                            if custom_search and st.button("🔍 Search Both Databases", key='custom_search_btn'):
-                                with st.spinner("Searching..."):
-                                    # Search DB1
-                                    cursor.execute(f"""
-                                        SELECT COUNT(*)
-                                        FROM {table_name}
-                                        WHERE LOWER({transcript_col}) LIKE ?
-                                    """, (f'%{custom_search.lower()}%',))
-                                    count1 = cursor.fetchone()[0]
-                                    
-                                    # Search DB2
-                                    cursor2.execute(f"""
-                                        SELECT COUNT(*)
-                                        FROM {table2}
-                                        WHERE LOWER({col2}) LIKE ?
-                                    """, (f'%{custom_search.lower()}%',))
-                                    count2_val = cursor2.fetchone()[0]
+                            run_search = st.form_submit_button("🔍 Search Both Databases")
+                        
+                        if run_search and custom_search:
+                            with st.spinner("Searching..."):
+                                # One query per database: match count and sample excerpts
+                                search_lower = custom_search.lower()
+                                params = (search_lower, f'%{search_lower}%')
+                                
+                                rows1 = cursor.execute(EXCERPT_SQL.format(col=transcript_col, table=table_name), params).fetchall()
+                                rows2 = cursor2.execute(EXCERPT_SQL.format(col=col2, table=table2), params).fetchall()
+                                
+                                count1 = rows1[0][0] if rows1 else 0
+                                count2_val = rows2[0][0] if rows2 else 0
+                                
+                                # Display results
+                                col1, col2 = st.columns(2)
+                                
+                                with col1:
+                                    st.metric(
+                                        f"{db1_name}",
+                                        f"{count1} mentions",
+                                        f"{count1/total_count1*100:.1f}% of sermons"
+                                    )
+                                
+                                with col2:
+                                    st.metric(
+                                        f"{db2_name}",
+                                        f"{count2_val} mentions",
+                                        f"{count2_val/total_count2*100:.1f}% of sermons"
+                                    )
+                                
+                                # Get sample contexts
+                                if count1 > 0 or count2_val > 0:
+                                    st.markdown("### 📄 Sample Contexts")
                                     
-                                    # Display results
                                     col1, col2 = st.columns(2)
                                     
                                     with col1:
-                                        st.metric(
-                                            f"{db1_name}",
-                                            f"{count1} mentions",
-                                            f"{count1/total_count1*100:.1f}% of sermons"
-                                        )
+                                        st.markdown(f"**{db1_name}:**")
+                                        for i, (_, excerpt) in enumerate(rows1):
+                                            if excerpt:
+                                                st.text_area("", excerpt, height=100, key=f"db1_{i}", disabled=True)
                                     
                                     with col2:
-                                        st.metric(
-                                            f"{db2_name}",
-                                            f"{count2_val} mentions",
-                                            f"{count2_val/count2*100:.1f}% of sermons"
-                                        )
-                                    
-                                    # Get sample contexts
-                                    if count1 > 0 or count2_val > 0:
-                                        st.markdown("### 📄 Sample Contexts")
-                                        
-                                        col1, col2 = st.columns(2)
-                                        
-                                        with col1:
-                                            st.markdown(f"**{db1_name}:**")
-                                            cursor.execute(f"""
-                                                SELECT {transcript_col}
-                                                FROM {table_name}
-                                                WHERE LOWER({transcript_col}) LIKE ?
-                                                LIMIT 3
-                                            """, (f'%{custom_search.lower()}%',))
-                                            
-                                            for i, (text,) in enumerate(cursor.fetchall()):
-                                                if text:
-                                                    pos = text.lower().find(custom_search.lower())
-                                                    if pos >= 0:
-                                                        start = max(0, pos - 200)
-                                                        end = min(len(text), pos + 200)
-                                                        excerpt = text[start:end]
-                                                        st.text_area("", excerpt, height=100, key=f"db1_{i}", disabled=True)
-                                        
-                                        with col2:
-                                            st.markdown(f"**{db2_name}:**")
-                                            cursor2.execute(f"""
-                                                SELECT {col2}
-                                                FROM {table2}
-                                                WHERE LOWER({col2}) LIKE ?
-                                                LIMIT 3
-                                            """, (f'%{custom_search.lower()}%',))
-                                            
-                                            for i, (text,) in enumerate(cursor2.fetchall()):
-                                                if text:
-                                                    pos = text.lower().find(custom_search.lower())
-                                                    if pos >= 0:
-                                                        start = max(0, pos - 200)
-                                                        end = min(len(text), pos + 200)
-                                                        excerpt = text[start:end]
-                                                        st.text_area("", excerpt, height=100, key=f"db2_{i}", disabled=True)
-                
-                conn2.close()
-                os.unlink(db2_path)  # Clean up temp file
+                                        st.markdown(f"**{db2_name}:**")
+                                        for i, (_, excerpt) in enumerate(rows2):
+                                            if excerpt:
+                                                st.text_area("", excerpt, height=100, key=f"db2_{i}", disabled=True)
                 
             except Exception as e:
                 st.error(f"Error loading second database: {str(e)}")
-                # Close connection if it exists before trying to delete
-                try:
-                    if 'conn2' in locals():
-                        conn2.close()
-                except:
-                    pass
-                # Now try to delete temp file
-                try:
-                    if os.path.exists(db2_path):
-                        os.unlink(db2_path)
-                except Exception as cleanup_error:
-                    # If cleanup fails, just log it but don't crash
-                    st.warning(f"Could not clean up temp file: {cleanup_error}")
         
         else:
             st.info("👆 Upload a second database above to start comparing")
@@ -1416,28 +2283,7 @@ Be objective, fair, and cite specific concerns."""
             # Canned questions dropdown
             canned_question = st.selectbox(
                 "Select a Question",
-                [
-                    "What does this teacher say about the nature of God?",
-                    "What is this teacher's view of the Holy Spirit?",
-                    "How does this teacher handle Scripture?",
-                    "What does this teacher teach about salvation?",
-                    "What does this teacher say about spiritual warfare?",
-                    "What does this teacher teach about prosperity/finances?",
-                    "What does this teacher say about healing?",
-                    "How does this teacher view the end times/eschatology?",
-                    "What does this teacher say about spiritual gifts?",
-                    "What does this teacher teach about prayer?",
-                    "What is this teacher's view of sin and holiness?",
-                    "What does this teacher say about suffering?",
-                    "How does this teacher view the role of prophets/prophecy?",
-                    "What does this teacher say about deliverance/demons?",
-                    "What is this teacher's view of the church?",
-                    "What does this teacher teach about grace vs works?",
-                    "What does this teacher say about faith?",
-                    "How does this teacher view miracles and signs?",
-                    "What does this teacher say about the cross/atonement?",
-                    "What is this teacher's view of generational curses?"
-                ]
+                CANNED_QUESTIONS
             )
             
             question_to_ask = canned_question
@@ -1451,23 +2297,39 @@ Be objective, fair, and cite specific concerns."""
             
             question_to_ask = custom_question
         
+        reuse_reworded = False
+        if SENTENCE_TRANSFORMERS_AVAILABLE:
+            reuse_reworded = st.checkbox(
+                "Reuse answers to reworded questions",
+                value=False,
+                help=f"Show the earlier answer when a question asked before means the same thing (similarity ≥ {QUESTION_SIMILARITY})"
+            )
+        
         # Ask button
         if st.button("🤖 Get Answer", type="primary", disabled=not question_to_ask):
-            if question_to_ask:
+            similar = find_similar_answer(db_path, question_to_ask, reuse_reworded) if question_to_ask else None
+            
+            if similar:
+                if normalize_question(similar['question']) == normalize_question(question_to_ask):
+                    st.info("Showing the earlier answer to this question")
+                else:
+                    st.info(f'Reusing the answer to a similar earlier question: "{similar["question"]}"')
+                
+                st.markdown("### 💡 Answer")
+                st.markdown(similar['answer'])
+                
+                with st.expander("📚 Sources Used"):
+                    for title in similar['sources']:
+                        st.markdown(f"**{title}**")
+            
+            elif question_to_ask:
                 with st.spinner(f"Searching database and analyzing..."):
                     try:
                         # Search database for relevant content
                         # Extract key terms from question
-                        search_terms = []
-                        # Simple keyword extraction (you could make this more sophisticated)
-                        important_words = ['god', 'holy spirit', 'scripture', 'salvation', 'spiritual warfare', 
-                                         'prosperity', 'healing', 'end times', 'gifts', 'prayer', 'sin', 'holiness',
-                                         'suffering', 'prophets', 'prophecy', 'deliverance', 'demons', 'church',
-                                         'grace', 'works', 'faith', 'miracles', 'cross', 'atonement', 'curse']
-                        
-                        for word in important_words:
-                            if word in question_to_ask.lower():
-                                search_terms.append(word)
+                        # Simple keyword extraction - one automaton pass over the question
+                        found = {term for _, term in iter_term_hits(question_to_ask.lower(), QUESTION_KEYWORDS)}
+                        search_terms = [word for word in QUESTION_KEYWORDS if word in found]
                         
                         # If no important words found, just use first few words
                         if not search_terms:
@@ -1477,7 +2339,7 @@ Be objective, fair, and cite specific concerns."""
                         cursor = conn.cursor()
                         conditions = []
                         for term in search_terms[:5]:  # Limit to 5 terms
-                            conditions.append(f"LOWER({transcript_col}) LIKE ?")
+                            conditions.append(f"{transcript_col} LIKE ?")
                         
                         if conditions:
                             query = f"""
@@ -1488,15 +2350,16 @@ Be objective, fair, and cite specific concerns."""
                             """
                             params = [f'%{term}%' for term in search_terms[:5]]
                         else:
-                            # Fallback - just get random samples
+                            # Fallback - just get random samples (picked in Python, no full-table sort)
+                            rowids = get_transcript_rowids(
+                                db_path, Path(db_path).stat().st_mtime, table_name, transcript_col
+                            )
+                            params = random.sample(rowids, min(5, len(rowids)))
                             query = f"""
                                 SELECT title, {transcript_col}
                                 FROM {table_name}
-                                WHERE {transcript_col} IS NOT NULL
-                                ORDER BY RANDOM()
-                                LIMIT 5
+                                WHERE rowid IN ({",".join("?" * len(params))})
                             """
-                            params = []
                         
                         cursor.execute(query, params)
                         results = cursor.fetchall()
@@ -1506,28 +2369,25 @@ Be objective, fair, and cite specific concerns."""
                         else:
                             st.info(f"Found {len(results)} relevant transcripts. Analyzing...")
                             
-                            # Combine relevant excerpts
-                            context = ""
-                            for title, text in results[:5]:
-                                if text:
-                                    # Get relevant excerpt (not whole thing)
-                                    excerpt = text[:3000]  # First 3000 chars
-                                    context += f"\n\n### {title}\n{excerpt}\n"
-                            
-                            # Ask Claude
-                            client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+                            # Combine relevant excerpts (not whole thing), centred on the matched
+                            # keyword and skipping repeated passages
+                            excerpts = drop_similar_excerpts(
+                                [(title, excerpt_window(text, search_terms[:5])) for title, text in results[:5] if text]
+                            )
+                            context = io.StringIO()
+                            for title, excerpt in excerpts:
+                                context.write(f"\n\n### {title}\n{excerpt}\n")
                             
-                            message = client.messages.create(
-                                model="claude-sonnet-4-20250514",
-                                max_tokens=2000,
-                                messages=[{
-                                    "role": "user",
-                                    "content": f"""Based on the following sermon transcripts, answer this question:
+                            # Ask Claude, showing the answer as it is written
+                            st.markdown("### 💡 Answer")
+                            answer = stream_claude_reply(
+                                st.empty(),
+                                f"""Based on the following sermon transcripts, answer this question:
 
 **QUESTION:** {question_to_ask}
 
 **RELEVANT TRANSCRIPTS:**
-{context}
+{context.getvalue()}
 
 INSTRUCTIONS:
 1. Answer the question directly with specific evidence
@@ -1537,17 +2397,16 @@ INSTRUCTIONS:
 5. Identify any concerning teachings with quoted evidence
 6. Keep answer focused and evidence-based
 
-Provide a clear, well-organized answer with quoted evidence."""
-                                }]
+Provide a clear, well-organized answer with quoted evidence.""",
+                                max_tokens=2000
                             )
                             
-                            st.markdown("### 💡 Answer")
-                            st.markdown(message.content[0].text)
-                            
                             # Show sources used
                             with st.expander("📚 Sources Used"):
-                                for title, text in results[:5]:
+                                for title, _ in excerpts:
                                     st.markdown(f"**{title}**")
+                            
+                            remember_answer(db_path, question_to_ask, answer, [title for title, _ in excerpts])
                     
                     except Exception as e:
                         st.error(f"Error: {str(e)}")
@@ -1623,18 +2482,15 @@ Provide a clear, well-organized answer with quoted evidence."""
                         cursor = conn.cursor()
                         search_terms = blog_topic.lower().split()
                         
-                        # Build search query
-                        conditions = []
-                        for term in search_terms:
-                            conditions.append(f"{transcript_col} LIKE '%{term}%'")
-                        query = " OR ".join(conditions)
+                        # Build search query (placeholders keep the statement reusable and safe)
+                        query = " OR ".join([f"{transcript_col} LIKE ?"] * len(search_terms))
                         
                         cursor.execute(f"""
                             SELECT title, {transcript_col}
                             FROM {table_name}
                             WHERE {query}
                             LIMIT 10
-                        """)
+                        """, [f'%{term}%' for term in search_terms])
                         
                         results = cursor.fetchall()
                         
@@ -1643,28 +2499,31 @@ Provide a clear, well-organized answer with quoted evidence."""
                         else:
                             st.success(f"Found {len(results)} relevant transcripts!")
                             
-                            # Extract key excerpts
-                            excerpts = []
+                            # Extract key excerpts (the first 3 hits) straight into the prompt buffer
+                            content = io.StringIO()
+                            num_excerpts = 0
                             for title, text in results[:5]:
+                                if num_excerpts == 3:
+                                    break
                                 if not text:
                                     continue
+                                text_lower = text.lower()
                                 for term in search_terms:
-                                    pos = text.lower().find(term)
+                                    pos = text_lower.find(term)
                                     if pos >= 0:
                                         start = max(0, pos - 300)
                                         end = min(len(text), pos + 700)
-                                        excerpt = text[start:end].strip()
-                                        excerpt = ' '.join(excerpt.split())
-                                        excerpts.append(excerpt)
+                                        if num_excerpts:
+                                            content.write("\n\n---\n\n")
+                                        content.write(' '.join(text[start:end].split()))
+                                        num_excerpts += 1
                                         break
                             
-                            combined_content = "\n\n---\n\n".join(excerpts[:3])
+                            combined_content = content.getvalue()
                             
                             # Generate blog post with Claude
                             with st.spinner("✨ Writing blog post with AI..."):
                                 try:
-                                    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-                                    
                                     word_target = {
                                         "Short (1000-1500 words)": "1000-1500",
                                         "Medium (1500-2500 words)": "1500-2500", 
@@ -1695,20 +2554,14 @@ REQUIREMENTS:
 
 Write the blog post now:"""
 
-                                    message = client.messages.create(
-                                        model="claude-sonnet-4-20250514",
-                                        max_tokens=4000,
-                                        messages=[{"role": "user", "content": prompt}]
+                                    # Display preview as the post is written
+                                    st.markdown("### Preview:")
+                                    blog_html = stream_claude_reply(
+                                        st.empty(), prompt, max_tokens=4000, unsafe_allow_html=True
                                     )
                                     
-                                    blog_html = message.content[0].text
-                                    
                                     st.success("✅ Blog post generated!")
                                     
-                                    # Display preview
-                                    st.markdown("### Preview:")
-                                    st.markdown(blog_html, unsafe_allow_html=True)
-                                    
                                     # Download button
                                     st.download_button(
                                         label="📥 Download HTML",
@@ -1763,23 +2616,12 @@ Write the blog post now:"""
         
         st.subheader("Step 1: Select Source Databases")
         
-        # Detect available databases in uploads directory
-        import glob
-        from pathlib import Path
-        
-        available_dbs = []
-        
-        # Check uploads directory
-        upload_path = Path("/mnt/user-data/uploads")
-        if upload_path.exists():
-            available_dbs.extend(glob.glob(str(upload_path / "*.db")))
-        
-        # Check current directory
-        available_dbs.extend(glob.glob("*.db"))
-        
-        # Remove duplicates and format nicely
-        available_dbs = list(set(available_dbs))
-        db_names = {Path(db).name: db for db in available_dbs}
+        # Detect available databases in uploads directory and current directory
+        available_dbs = list_db_files(DB_SEARCH_DIRS)
+        # First path wins for a file name found in more than one place (uploads come first)
+        db_names = {}
+        for db in available_dbs:
+            db_names.setdefault(os.path.basename(db), db)
         
         # Always include current database
         current_db_name = Path(db_path).name
@@ -1814,11 +2656,16 @@ Write the blog post now:"""
         )
         
         if uploaded_dbs:
-            import tempfile
+            # Each upload is copied to disk once per session, not on every rerun
+            upload_paths = st.session_state.setdefault('series_upload_paths', {})
             for uploaded_db in uploaded_dbs:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
-                    tmp.write(uploaded_db.read())
-                    selected_dbs[uploaded_db.name] = tmp.name
+                key = (uploaded_db.name, uploaded_db.size)
+                if key not in upload_paths:
+                    uploaded_db.seek(0)
+                    with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp:
+                        shutil.copyfileobj(uploaded_db, tmp, length=1024 * 1024)  # 1 MiB chunks
+                    upload_paths[key] = tmp.name
+                selected_dbs[uploaded_db.name] = upload_paths[key]
             
             st.success(f"✅ Added {len(uploaded_dbs)} uploaded database(s)")
         
@@ -1837,12 +2684,8 @@ Write the blog post now:"""
                 with cols[idx]:
                     # Get database stats
                     try:
-                        temp_conn = sqlite3.connect(path)
-                        temp_table, temp_col = detect_schema(temp_conn)
-                        temp_cursor = temp_conn.cursor()
-                        temp_cursor.execute(f"SELECT COUNT(*) FROM {temp_table}")
-                        sermon_count = temp_cursor.fetchone()[0]
-                        temp_conn.close()
+                        file_stat = os.stat(path)
+                        _, _, sermon_count = db_file_stats(path, file_stat.st_mtime, file_stat.st_size)
                         
                         st.metric(name, f"{sermon_count} sermons")
                         weights[name] = st.slider(
@@ -1931,21 +2774,15 @@ Write the blog post now:"""
         if series_topic and st.button("📋 Generate Series Outline", type="secondary"):
             with st.spinner("Creating series outline..."):
                 try:
-                    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+                    client = get_anthropic_client()
                     
-                    outline_prompt = f"""Create an outline for a {num_posts}-post blog series on "{series_topic}" for a {series_audience.lower()} audience.
-
-Series Style: {series_style}
-Post Length: {post_length}
-
-Provide:
-1. Series title (compelling, clear)
-2. Series description (2-3 sentences)
-3. {num_posts} post titles that flow logically
-4. Brief description of what each post covers
-5. How the series builds/progresses
-
-Make it practical, hope-filled, and theologically sound."""
+                    outline_prompt = SERIES_OUTLINE_PROMPT.format(
+                        num_posts=num_posts,
+                        topic=series_topic,
+                        audience_lower=series_audience.lower(),
+                        style=series_style,
+                        post_length=post_length
+                    )
 
                     outline_response = client.messages.create(
                         model="claude-sonnet-4-20250514",
@@ -1976,45 +2813,43 @@ Make it practical, hope-filled, and theologically sound."""
                 
                 st.info(f"📊 Collecting {total_sermons_needed} total sermons: {sermons_from_each_db}")
                 
-                # Collect sermons from each database
+                # Collect sermons from each database: files, schemas and indexes are resolved
+                # here on the script thread (the only writer), then the searches run side by
+                # side, each on its own read-only connection (sqlite3 releases the GIL while
+                # a query runs)
                 all_sources = []
+                search_terms = series_topic.lower().split()
+                searches = []
                 
-                for db_name, db_path_local in selected_dbs.items():
-                    try:
-                        temp_conn = sqlite3.connect(db_path_local)
-                        temp_table, temp_col = detect_schema(temp_conn)
-                        
-                        if not temp_table:
-                            continue
-                        
-                        # Search for relevant sermons
-                        search_terms = series_topic.lower().split()
-                        conditions = [f"LOWER({temp_col}) LIKE ?" for _ in search_terms]
-                        query = f"""
-                            SELECT title, {temp_col}
-                            FROM {temp_table}
-                            WHERE {' OR '.join(conditions)}
-                            AND {temp_col} IS NOT NULL
-                            ORDER BY LENGTH({temp_col}) DESC
-                            LIMIT ?
-                        """
-                        params = [f'%{term}%' for term in search_terms] + [sermons_from_each_db.get(db_name, 5)]
-                        
-                        temp_cursor = temp_conn.cursor()
-                        temp_cursor.execute(query, params)
-                        
-                        for title, text in temp_cursor.fetchall():
-                            if text:
+                with ThreadPoolExecutor(max_workers=min(8, len(selected_dbs))) as pool:
+                    for db_name, db_path_local in selected_dbs.items():
+                        try:
+                            file_stat = os.stat(db_path_local)
+                            temp_table, temp_col, _ = db_file_stats(db_path_local, file_stat.st_mtime, file_stat.st_size)
+                            
+                            if not temp_table:
+                                continue
+                            
+                            index_path = ensure_fts_index(db_path_local, temp_table, temp_col)
+                            
+                            searches.append((db_name, pool.submit(
+                                search_series_sources,
+                                db_path_local, temp_table, temp_col, index_path, search_terms,
+                                sermons_from_each_db.get(db_name, 5)
+                            )))
+                        except Exception as e:
+                            st.error(f"Error searching {db_name}: {e}")
+                    
+                    for db_name, future in searches:
+                        try:
+                            for title, text in future.result():
                                 all_sources.append({
                                     'database': db_name,
                                     'title': title,
                                     'text': text
                                 })
-                        
-                        temp_conn.close()
-                        
-                    except Exception as e:
-                        st.error(f"Error searching {db_name}: {e}")
+                        except Exception as e:
+                            st.error(f"Error searching {db_name}: {e}")
                 
                 if not all_sources:
                     st.error(f"No relevant content found for '{series_topic}'. Try different keywords.")
@@ -2037,71 +2872,65 @@ Make it practical, hope-filled, and theologically sound."""
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
+                    word_target = post_length.split("(")[1].split(" ")[0]
+                    
+                    # Consecutive batches of the evenly mixed sources, so every post draws
+                    # on each database in proportion to its weight
+                    source_batches = chunked(spread_by_database(all_sources), sermons_per_post)
+                    
+                    post_prompts = []
+                    post_sources_list = []
                     for post_num in range(1, num_posts + 1):
-                        status_text.text(f"Generating Post {post_num} of {num_posts}...")
-                        
-                        # Select sources for this post
-                        start_idx = (post_num - 1) * sermons_per_post
-                        end_idx = start_idx + sermons_per_post
-                        post_sources = all_sources[start_idx:end_idx]
+                        # Select sources for this post (by title, so the same sermons give the same prefix)
+                        post_sources = sorted(next(source_batches, []), key=lambda source: source['title'])
+                        post_sources_list.append(post_sources)
                         
                         # Build context from complete sermons
-                        context = ""
+                        buf = io.StringIO()
                         for idx, source in enumerate(post_sources, 1):
-                            context += f"\n\n{'='*60}\n"
-                            context += f"SOURCE {idx}: {source['title']} (from {source['database']})\n"
-                            context += f"{'='*60}\n"
-                            context += source['text'][:15000]  # Limit to ~15k chars per sermon
+                            buf.write(f"\n\n{'='*60}\n")
+                            buf.write(f"SOURCE {idx}: {source['title']} (from {source['database']})\n")
+                            buf.write(f"{'='*60}\n")
+                            buf.write(source['text'])  # Already trimmed to SERIES_SOURCE_CHARS
+                        context = buf.getvalue()
                         
-                        # Generate post
-                        try:
-                            client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-                            
-                            word_target = post_length.split("(")[1].split(" ")[0]
-                            
-                            post_prompt = f"""Write Post {post_num} of {num_posts} in a series on "{series_topic}".
-
-TARGET AUDIENCE: {series_audience}
-SERIES STYLE: {series_style}
-TARGET LENGTH: {word_target} words
-
-SOURCE MATERIAL (Complete Sermons):
-{context}
-
-REQUIREMENTS:
-1. This is post {post_num} of {num_posts} - {"introduce the topic" if post_num == 1 else "build on previous posts" if post_num < num_posts else "conclude the series"}
-2. Use the complete sermon content to understand the full message arc
-3. Write in a warm, hopeful, {series_audience.lower()} tone
-4. Include:
-   - Compelling introduction
-   - Clear h2/h3 section headers
-   - Biblical references
-   - Practical application
-   - {"Transition to next post" if post_num < num_posts else "Powerful series conclusion"}
-5. Output clean HTML (h2, h3, p, ul, ol, blockquote only)
-6. Authentically reflect the source material's theology and tone
-
-Write Post {post_num}:"""
-
-                            message = client.messages.create(
-                                model="claude-sonnet-4-20250514",
-                                max_tokens=4000,
-                                messages=[{"role": "user", "content": post_prompt}]
+                        role = "first" if post_num == 1 else "middle" if post_num < num_posts else "last"
+                        post_prompts.append(cached_prefix_prompt(
+                            SERIES_SOURCES_PROMPT.format(context=context),
+                            SERIES_POST_PROMPT.format(
+                                post_num=post_num,
+                                num_posts=num_posts,
+                                topic=series_topic,
+                                audience=series_audience,
+                                audience_lower=series_audience.lower(),
+                                style=series_style,
+                                word_target=word_target,
+                                role=SERIES_POST_ROLES[role],
+                                ending=SERIES_POST_ENDINGS[post_num == num_posts]
                             )
-                            
-                            post_html = message.content[0].text
-                            
-                            series_posts.append({
-                                'post_num': post_num,
-                                'html': post_html,
-                                'sources': [s['title'] for s in post_sources],
-                                'databases': [s['database'] for s in post_sources]
-                            })
-                            
-                        except Exception as e:
-                            st.error(f"Error generating post {post_num}: {e}")
+                        ))
+                    
+                    # All posts are written concurrently; the bar advances as each one finishes.
+                    # Never from the cache: generating again should give a new draft
+                    status_text.text(f"Generating {num_posts} posts...")
+                    replies = run_claude_prompts(
+                        post_prompts, max_tokens=4000, max_concurrent=5,
+                        on_progress=lambda finished, total: progress_bar.progress(finished / total),
+                        use_cache=False
+                    )
+                    
+                    for post_num, (post_html, post_sources) in enumerate(zip(replies, post_sources_list), 1):
+                        if isinstance(post_html, Exception):
+                            st.error(f"Error generating post {post_num}: {post_html}")
+                            continue
                         
-                        progress_bar.progress(post_num / num_posts)
+                        series_posts.append({
+                            'post_num': post_num,
+                            'html': post_html,
+                            'sources': [s['title'] for s in post_sources],
+                            'databases': [s['database'] for s in post_sources],
+                            'sources_md': "\n".join(f"- {s['title']} ({s['database']})" for s in post_sources)
+                        })
                     
                     status_text.text("✅ Series generation complete!")
                     
@@ -2156,6 +2985,11 @@ Write Post {post_num}:"""
                             **Download:** Scroll to bottom for combined file
                             """)
                     
+                    # Each post is converted to Markdown once, shared by every download below
+                    post_markdown = {
+                        post['post_num']: html_to_markdown(post['html']) for post in series_posts
+                    } if HTML2TEXT_AVAILABLE else {}
+                    
                     # Individual posts
                     st.markdown("### 📄 Individual Posts:")
                     
@@ -2165,8 +2999,7 @@ Write Post {post_num}:"""
                             
                             st.markdown("---")
                             st.markdown("**Sources Used:**")
-                            for title, db in zip(post['sources'], post['databases']):
-                                st.markdown(f"- {title} ({db})")
+                            st.markdown(post['sources_md'])
                             
                             st.markdown("")  # Spacing
                             
@@ -2183,14 +3016,9 @@ Write Post {post_num}:"""
                             with col2:
                                 # Add markdown download option if html2text available
                                 if HTML2TEXT_AVAILABLE:
-                                    import html2text
-                                    h = html2text.HTML2Text()
-                                    h.ignore_links = False
-                                    markdown_content = h.handle(post['html'])
-                                    
                                     st.download_button(
                                         label=f"📥 Download MD",
-                                        data=markdown_content,
+                                        data=post_markdown[post['post_num']],
                                         file_name=f"{series_topic.replace(' ', '-').lower()}-post-{post['post_num']}.md",
                                         mime="text/markdown",
                                         key=f"download_post_md_{post['post_num']}"
@@ -2207,12 +3035,9 @@ Write Post {post_num}:"""
                         for p in series_posts
                     ])
                     
-                    # Convert to markdown if available
+                    # Join the per-post Markdown if available (no second pass over the combined HTML)
                     if HTML2TEXT_AVAILABLE:
-                        import html2text
-                        h = html2text.HTML2Text()
-                        h.ignore_links = False
-                        complete_series_md = h.handle(complete_series_html)
+                        complete_series_md = "\n\n".join(post_markdown[p['post_num']] for p in series_posts)
                     else:
                         complete_series_md = None
                     
@@ -2240,31 +3065,16 @@ Write Post {post_num}:"""
                     
                     zip_col_idx = 2 if HTML2TEXT_AVAILABLE else 1
                     with cols[zip_col_idx]:
-                        # Create ZIP file with all individual posts
-                        import zipfile
-                        import io
-                        
-                        zip_buffer = io.BytesIO()
-                        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                            for post in series_posts:
-                                # Add HTML
-                                zip_file.writestr(
-                                    f"post-{post['post_num']}.html",
-                                    post['html']
-                                )
-                                # Add Markdown if available
-                                if HTML2TEXT_AVAILABLE:
-                                    h = html2text.HTML2Text()
-                                    h.ignore_links = False
-                                    md = h.handle(post['html'])
-                                    zip_file.writestr(
-                                        f"post-{post['post_num']}.md",
-                                        md
-                                    )
+                        # Create ZIP file with all individual posts (HTML, plus Markdown if available)
+                        zip_files = []
+                        for post in series_posts:
+                            zip_files.append((f"post-{post['post_num']}.html", post['html']))
+                            if HTML2TEXT_AVAILABLE:
+                                zip_files.append((f"post-{post['post_num']}.md", post_markdown[post['post_num']]))
                         
                         st.download_button(
                             label=f"📦 ZIP (All Files)",
-                            data=zip_buffer.getvalue(),
+                            data=build_zip(tuple(zip_files)),
                             file_name=f"{series_topic.replace(' ', '-').lower()}-series.zip",
                             mime="application/zip",
                             use_container_width=True
@@ -2273,8 +3083,14 @@ Write Post {post_num}:"""
                     readme_col_idx = 3 if HTML2TEXT_AVAILABLE else 2
                     with cols[readme_col_idx]:
                         # Create README for the series
+                        source_counts = Counter(db for post in series_posts for db in post['databases'])
+                        post_lines = "\n".join(
+                            f"{idx}. Post {idx} ({post['word_count'] if 'word_count' in post else '~' + word_target} words)"
+                            for idx, post in enumerate(series_posts, 1)
+                        )
+                        source_lines = "\n".join(f"- {db}: {count} sermons" for db, count in source_counts.items())
                         readme = f"""# {series_topic}
-                        
+
 ## Series Information
 - **Posts:** {num_posts}
 - **Total Words:** ~{num_posts * int(word_target)}
@@ -2282,23 +3098,11 @@ Write Post {post_num}:"""
 - **Style:** {series_style}
 
 ## Posts in This Series
-"""
-                        for idx, post in enumerate(series_posts, 1):
-                            readme += f"\n{idx}. Post {idx} ({post['word_count'] if 'word_count' in post else '~' + word_target} words)"
-                        
-                        readme += f"""
+
+{post_lines}
 
 ## Sources Used
-"""
-                        source_counts = {}
-                        for post in series_posts:
-                            for db in post['databases']:
-                                source_counts[db] = source_counts.get(db, 0) + 1
-                        
-                        for db, count in source_counts.items():
-                            readme += f"- {db}: {count} sermons\n"
-                        
-                        readme += f"""
+{source_lines}
 
 ## Files Included
 - Individual posts (HTML + Markdown)
@@ -2339,9 +3143,6 @@ Write Post {post_num}:"""
         st.header("🗄️ Series Library")
         st.markdown("*All your generated series in one place - never lose content again*")
         
-        # Initialize library
-        library_path = init_series_library()
-        
         # Search and filter
         col1, col2, col3 = st.columns([3, 1, 1])
         
@@ -2382,50 +3183,51 @@ Write Post {post_num}:"""
             **This prevents losing content** when you close your browser!
             """)
         else:
-            # Display series in grid
-            for series in all_series:
-                series_id, title, topic, num_posts, audience, date_created, status, total_words = series
-                
-                # Parse date
-                try:
-                    date_obj = datetime.fromisoformat(date_created)
-                    date_str = date_obj.strftime("%B %d, %Y")
-                except:
-                    date_str = date_created
-                
-                # Create card for each series
-                with st.expander(f"📚 {title}", expanded=False):
-                    col1, col2 = st.columns([2, 1])
-                    
-                    with col1:
-                        st.markdown(f"**Topic:** {topic}")
-                        st.markdown(f"**Posts:** {num_posts} posts")
-                        st.markdown(f"**Total Words:** ~{total_words:,}")
-                        st.markdown(f"**Audience:** {audience}")
-                        st.markdown(f"**Created:** {date_str}")
-                        
-                        # Status badge
-                        if status.lower() == 'published':
-                            st.success("✅ Published")
-                        else:
-                            st.info("📝 Draft")
-                    
-                    with col2:
-                        # Action buttons
-                        if st.button("👁️ View Details", key=f"view_{series_id}"):
-                            st.session_state['viewing_series'] = series_id
-                        
-                        if st.button("📥 Download", key=f"download_{series_id}"):
-                            st.session_state['downloading_series'] = series_id
-                        
-                        if st.button("🗑️ Delete", key=f"delete_{series_id}", type="secondary"):
-                            if st.session_state.get(f'confirm_delete_{series_id}'):
-                                delete_series(series_id)
-                                st.success(f"Deleted: {title}")
-                                st.rerun()
-                            else:
-                                st.session_state[f'confirm_delete_{series_id}'] = True
-                                st.warning("Click again to confirm deletion")
+            # One table for the whole library (st.dataframe is a single element however many
+            # rows it has); actions are drawn only for the series picked below it
+            library_df = pd.DataFrame(
+                [
+                    {
+                        'Title': title,
+                        'Topic': topic,
+                        'Posts': num_posts,
+                        'Words': f"~{total_words:,}",
+                        'Audience': audience,
+                        'Created': format_library_date(date_created),
+                        'Status': "✅ Published" if status.lower() == 'published' else "📝 Draft"
+                    }
+                    for _, title, topic, num_posts, audience, date_created, status, total_words in all_series
+                ]
+            )
+            st.dataframe(library_df, hide_index=True, use_container_width=True)
+            
+            series_titles = {series[0]: series[1] for series in all_series}
+            series_id = st.selectbox(
+                "Select a series",
+                list(series_titles),
+                format_func=lambda sid: f"📚 {series_titles[sid]}"
+            )
+            title = series_titles[series_id]
+            
+            # Action buttons
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if st.button("👁️ View Details", key=f"view_{series_id}", use_container_width=True):
+                    st.session_state['viewing_series'] = series_id
+            
+            with col2:
+                if st.button("📥 Download", key=f"download_{series_id}", use_container_width=True):
+                    st.session_state['downloading_series'] = series_id
+            
+            with col3:
+                if st.button("🗑️ Delete", key=f"delete_{series_id}", type="secondary", use_container_width=True):
+                    if st.session_state.get(f'confirm_delete_{series_id}'):
+                        delete_series(series_id)
+                        st.success(f"Deleted: {title}")
+                        st.rerun()
+                    else:
+                        st.session_state[f'confirm_delete_{series_id}'] = True
+                        st.warning("Click again to confirm deletion")
         
         # View series details
         if 'viewing_series' in st.session_state:
@@ -2455,15 +3257,20 @@ Write Post {post_num}:"""
                 with col3:
                     st.metric("Estimated Cost", f"${series_data[10]:.2f}")
                 
-                # Source breakdown
-                if series_data[8]:  # source_databases
-                    try:
-                        sources = json.loads(series_data[8])
-                        st.markdown("**Source Databases:**")
-                        for db_name, weight in sources.items():
-                            st.progress(weight, text=f"{db_name}: {weight*100:.0f}%")
-                    except:
-                        pass
+                # Source breakdown (one table, whatever the number of databases)
+                if details['sources']:
+                    st.markdown("**Source Databases:**")
+                    st.dataframe(
+                        pd.DataFrame({
+                            'Database': list(details['sources']),
+                            'Weight': list(details['sources'].values())
+                        }),
+                        column_config={
+                            'Weight': st.column_config.ProgressColumn(min_value=0, max_value=1, format="%.2f")
+                        },
+                        hide_index=True,
+                        use_container_width=True
+                    )
                 
                 # Posts list
                 st.markdown("---")
@@ -2474,7 +3281,7 @@ Write Post {post_num}:"""
                     
                     with st.expander(f"Post {post_num}: {post_title or 'Untitled'}", expanded=False):
                         # Preview
-                        st.markdown(html_content[:500] + "..." if len(html_content) > 500 else html_content, unsafe_allow_html=True)
+                        st.markdown(post_preview(html_content))
                         
                         st.markdown("---")
                         
@@ -2503,38 +3310,41 @@ Write Post {post_num}:"""
                 st.markdown("---")
                 st.markdown("### 📥 Download Complete Series")
                 
-                complete_html = "\n\n".join([f"<!-- POST {p[2]} -->\n{p[4]}" for p in posts_data])
-                
                 col1, col2, col3 = st.columns(3)
                 
+                # Combined HTML and ZIP are built only once asked for, so other reruns of this view skip them
+                downloads_key = f"downloads_ready_{series_data[0]}"
+                downloads_ready = st.session_state.get(downloads_key, False)
+                
                 with col1:
-                    st.download_button(
-                        label="📥 Complete Series (HTML)",
-                        data=complete_html,
-                        file_name=f"{series_data[2].replace(' ', '-').lower()}-complete.html",
-                        mime="text/html",
-                        use_container_width=True
-                    )
+                    if not downloads_ready:
+                        if st.button("📦 Prepare Series Downloads", use_container_width=True):
+                            st.session_state[downloads_key] = True
+                            st.rerun()
+                    else:
+                        st.download_button(
+                            label="📥 Complete Series (HTML)",
+                            data="\n\n".join(f"<!-- POST {p[2]} -->\n{p[4]}" for p in posts_data),
+                            file_name=f"{series_data[2].replace(' ', '-').lower()}-complete.html",
+                            mime="text/html",
+                            use_container_width=True
+                        )
                 
                 with col2:
-                    # Create ZIP
-                    import zipfile
-                    import io
-                    
-                    zip_buffer = io.BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                    if downloads_ready:
+                        zip_files = []
                         for post in posts_data:
-                            zip_file.writestr(f"post-{post[2]}.html", post[4])
+                            zip_files.append((f"post-{post[2]}.html", post[4]))
                             if post[5]:  # markdown
-                                zip_file.writestr(f"post-{post[2]}.md", post[5])
-                    
-                    st.download_button(
-                        label="📦 ZIP Package",
-                        data=zip_buffer.getvalue(),
-                        file_name=f"{series_data[2].replace(' ', '-').lower()}-series.zip",
-                        mime="application/zip",
-                        use_container_width=True
-                    )
+                                zip_files.append((f"post-{post[2]}.md", post[5]))
+                        
+                        st.download_button(
+                            label="📦 ZIP Package",
+                            data=build_zip(tuple(zip_files)),
+                            file_name=f"{series_data[2].replace(' ', '-').lower()}-series.zip",
+                            mime="application/zip",
+                            use_container_width=True
+                        )
                 
                 with col3:
                     # Update status
@@ -2546,14 +3356,7 @@ Write Post {post_num}:"""
                     )
                     
                     if st.button("💾 Update Status"):
-                        library_conn = sqlite3.connect(library_path)
-                        cursor = library_conn.cursor()
-                        cursor.execute(
-                            "UPDATE series_library SET status = ? WHERE series_id = ?",
-                            (new_status, series_id)
-                        )
-                        library_conn.commit()
-                        library_conn.close()
+                        update_series_status(series_id, new_status)
                         st.success(f"Status updated to: {new_status}")
         
         # Library stats
@@ -2561,9 +3364,7 @@ Write Post {post_num}:"""
             st.markdown("---")
             st.markdown("### 📊 Library Statistics")
             
-            total_series = len(all_series)
-            total_posts = sum(s[3] for s in all_series)
-            total_words = sum(s[7] for s in all_series)
+            total_series, total_posts, total_words = library_stats()
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -2572,8 +3373,6 @@ Write Post {post_num}:"""
                 st.metric("Total Posts", total_posts)
             with col3:
                 st.metric("Total Words", f"{total_words:,}")
-    
-    conn.close()
 
 else:
     st.error("Can't connect to database")
@@ -4,15 +4,20 @@ Daily Devotional Generator
 Generates 10 devotionals from ministry content databases
 Output: Professional PDFs ready for distribution
 """
-st.wriimport streamlit as st
+import streamlit as st
 import sqlite3
+import os
+import random
+import re
+import json
+import hashlib
 import anthropic
 from pathlib import Path
 from datetime import datetime
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Flowable
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.lib import colors
 import io
@@ -37,13 +42,20 @@ except:
 # ============================================================================
 
 def find_databases():
-    """Find all available database files"""
-    search_paths = [
+    """Find all available database files (re-scanned only when a search directory changes)"""
+    search_paths = (
         Path("/mnt/user-data/outputs"),
         Path("/mnt/user-data/uploads"),
         Path.cwd()
-    ]
+    )
     
+    # A directory's mtime moves whenever a file is added, removed or renamed in it
+    signature = tuple(path.stat().st_mtime_ns if path.exists() else None for path in search_paths)
+    return scan_databases(search_paths, signature)
+
+@st.cache_data(show_spinner=False)
+def scan_databases(search_paths, signature):
+    """Database files by stem, first search path wins; cached per directory signature"""
     databases = {}
     for path in search_paths:
         if path.exists():
@@ -53,102 +65,174 @@ def find_databases():
     
     return databases
 
+@st.cache_resource
+def open_database(db_path):
+    """Get the shared connection for a content database (opened and tuned once per process)"""
+    # Streamlit reruns on different threads, so the connection must be shareable
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+@st.cache_data(show_spinner=False)
+def load_database_info(db_path, mtime):
+    """Table, transcript column and size of a database, cached until the file changes"""
+    cursor = open_database(db_path).cursor()
+    
+    # Detect table
+    cursor.execute("""
+        SELECT name FROM sqlite_master 
+        WHERE type='table' AND (name='transcripts' OR name='video_transcripts')
+    """)
+    result = cursor.fetchone()
+    
+    if not result:
+        return None
+    
+    table_name = result[0]
+    
+    # Get transcript column
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    transcript_col = 'transcript_text' if 'transcript_text' in columns else 'transcript'
+    
+    # Get stats (count and size in one scan)
+    cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(LENGTH({transcript_col})), 0) FROM {table_name}")
+    count, total_chars = cursor.fetchone()
+    
+    return {
+        'table_name': table_name,
+        'transcript_col': transcript_col,
+        'count': count,
+        'total_chars': total_chars
+    }
+
 def get_database_info(db_path):
     """Get basic info about a database"""
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Detect table
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND (name='transcripts' OR name='video_transcripts')
-        """)
-        result = cursor.fetchone()
-        
-        if not result:
-            return None
-        
-        table_name = result[0]
-        
-        # Get stats
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        count = cursor.fetchone()[0]
-        
-        # Get transcript column
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        transcript_col = 'transcript_text' if 'transcript_text' in columns else 'transcript'
-        
-        cursor.execute(f"SELECT SUM(LENGTH({transcript_col})) FROM {table_name}")
-        total_chars = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        return {
-            'table_name': table_name,
-            'transcript_col': transcript_col,
-            'count': count,
-            'total_chars': total_chars
-        }
+        return load_database_info(db_path, os.path.getmtime(db_path))
     except Exception as e:
         st.error(f"Database error: {e}")
         return None
 
-def get_sample_content(db_path, table_name, transcript_col, max_words=50000):
+@st.cache_data(show_spinner=False)
+def load_transcript_rowids(db_path, mtime, table_name, transcript_col):
+    """Rowids of rows that have a transcript, cached until the database file changes"""
+    cursor = open_database(db_path).execute(
+        f"SELECT rowid FROM {table_name} WHERE {transcript_col} IS NOT NULL"
+    )
+    return [row[0] for row in cursor]
+
+def get_sample_content(db_path, table_name, transcript_col, max_chars=40000):
     """Get sample content from database for devotional generation"""
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        # Get a good sampling of content (rows picked in Python, no full-table sort)
+        rowids = load_transcript_rowids(db_path, os.path.getmtime(db_path), table_name, transcript_col)
+        picked = random.sample(rowids, min(5, len(rowids)))
         
-        # Get a good sampling of content
+        cursor = open_database(db_path).cursor()
         cursor.execute(f"""
             SELECT {transcript_col} 
             FROM {table_name}
-            ORDER BY RANDOM()
-            LIMIT 5
-        """)
+            WHERE rowid IN ({",".join("?" * len(picked))})
+        """, picked)
         
         samples = cursor.fetchall()
-        conn.close()
-        
-        # Combine and limit
-        combined = "\n\n".join([s[0] for s in samples if s[0]])
-        words = combined.split()
-        
-        if len(words) > max_words:
-            combined = " ".join(words[:max_words])
         
-        return combined
+        # Combine and limit to what the prompt can hold (one slice, no split/re-join)
+        return "\n\n".join([s[0] for s in samples if s[0]])[:max_chars]
     except Exception as e:
         st.error(f"Error sampling content: {e}")
         return ""
 
 # ============================================================================
-# PDF GENERATION
+# DEVOTIONAL CACHE
 # ============================================================================
 
-def create_devotional_pdf(devotionals, output_path, source_name):
-    """Create professional PDF with all devotionals"""
+# Not a .db file, so find_databases() never offers it as a content database
+CACHE_PATH = Path("/mnt/user-data/outputs/devotional_cache.sqlite")
+
+@st.cache_resource
+def get_cache_conn():
+    """Get the shared devotional cache connection (table created on first use)"""
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(str(CACHE_PATH), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS devotional_cache (
+            cache_key TEXT PRIMARY KEY,
+            devotionals TEXT NOT NULL,
+            date_created TEXT NOT NULL
+        )
+    """)
+    conn.commit()
     
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=0.75*inch,
-        leftMargin=0.75*inch,
-        topMargin=0.75*inch,
-        bottomMargin=0.75*inch
-    )
+    return conn
+
+def devotional_cache_key(db_path, topic, source_name):
+    """Key for a generated set: the database file as it is now, the topic and the attribution"""
+    mtime = os.path.getmtime(db_path)
+    return hashlib.sha1(f"{Path(db_path).resolve()}|{mtime}|{topic}|{source_name}".encode()).hexdigest()
+
+def load_cached_devotionals(cache_key):
+    """Previously generated (devotionals, date_created) for a key, or (None, None)
     
-    # Custom styles
-    styles = getSampleStyleSheet()
+    Incomplete sets (fewer than 10 devotionals) are never reused.
+    """
+    row = get_cache_conn().execute(
+        "SELECT devotionals, date_created FROM devotional_cache WHERE cache_key = ?",
+        (cache_key,)
+    ).fetchone()
+    
+    if not row:
+        return None, None
+    
+    devotionals = json.loads(row[0])
+    return (devotionals, row[1]) if len(devotionals) >= 10 else (None, None)
+
+def save_cached_devotionals(cache_key, devotionals):
+    """Store a generated set, replacing any earlier one for the same key"""
+    conn = get_cache_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO devotional_cache VALUES (?, ?, ?)",
+            (cache_key, json.dumps(devotionals), datetime.now().isoformat())
+        )
+
+# ============================================================================
+# PDF GENERATION
+# ============================================================================
+
+class NoteLines(Flowable):
+    """Ruled lines for handwritten notes, drawn straight onto the canvas"""
+    
+    def __init__(self, num_lines=6, gap=22, width=6.5*inch):
+        super().__init__()
+        self.num_lines = num_lines
+        self.gap = gap
+        self.width = width
+    
+    def wrap(self, available_width, available_height):
+        return self.width, self.num_lines * self.gap
+    
+    def draw(self):
+        self.canv.setStrokeColor(colors.HexColor('#cccccc'))
+        self.canv.setLineWidth(0.5)
+        for i in range(self.num_lines):
+            self.canv.line(0, i * self.gap, self.width, i * self.gap)
+
+@st.cache_resource
+def get_pdf_styles():
+    """Paragraph styles for the devotional PDF (built once per process, never modified)"""
+    base = getSampleStyleSheet()
     
     # Title style
-    title_style = ParagraphStyle(
+    title = ParagraphStyle(
         'CustomTitle',
-        parent=styles['Heading1'],
+        parent=base['Heading1'],
         fontSize=18,
         textColor=colors.HexColor('#667eea'),
         spaceAfter=12,
@@ -157,9 +241,9 @@ def create_devotional_pdf(devotionals, output_path, source_name):
     )
     
     # Subtitle style
-    subtitle_style = ParagraphStyle(
+    subtitle = ParagraphStyle(
         'Subtitle',
-        parent=styles['Heading2'],
+        parent=base['Heading2'],
         fontSize=12,
         textColor=colors.HexColor('#666666'),
         spaceAfter=20,
@@ -168,9 +252,9 @@ def create_devotional_pdf(devotionals, output_path, source_name):
     )
     
     # Body style
-    body_style = ParagraphStyle(
+    body = ParagraphStyle(
         'CustomBody',
-        parent=styles['BodyText'],
+        parent=base['BodyText'],
         fontSize=11,
         leading=16,
         alignment=TA_JUSTIFY,
@@ -179,9 +263,9 @@ def create_devotional_pdf(devotionals, output_path, source_name):
     )
     
     # Scripture style
-    scripture_style = ParagraphStyle(
+    scripture = ParagraphStyle(
         'Scripture',
-        parent=styles['BodyText'],
+        parent=base['BodyText'],
         fontSize=10,
         leading=14,
         textColor=colors.HexColor('#333333'),
@@ -191,9 +275,9 @@ def create_devotional_pdf(devotionals, output_path, source_name):
     )
     
     # Section header style
-    section_style = ParagraphStyle(
+    section = ParagraphStyle(
         'SectionHeader',
-        parent=styles['Heading3'],
+        parent=base['Heading3'],
         fontSize=11,
         textColor=colors.HexColor('#667eea'),
         spaceAfter=8,
@@ -202,73 +286,88 @@ def create_devotional_pdf(devotionals, output_path, source_name):
     )
     
     # Attribution style
-    attribution_style = ParagraphStyle(
+    attribution = ParagraphStyle(
         'Attribution',
-        parent=styles['BodyText'],
+        parent=base['BodyText'],
         fontSize=8,
         textColor=colors.HexColor('#999999'),
         alignment=TA_CENTER,
         fontName='Helvetica-Oblique'
     )
     
+    return {
+        'title': title,
+        'subtitle': subtitle,
+        'body': body,
+        'scripture': scripture,
+        'section': section,
+        'attribution': attribution
+    }
+
+def create_devotional_pdf(devotionals, output_path, source_name):
+    """Create professional PDF with all devotionals"""
+    
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=0.75*inch,
+        leftMargin=0.75*inch,
+        topMargin=0.75*inch,
+        bottomMargin=0.75*inch,
+        pageCompression=1,  # deflate page content streams
+        invariant=1  # no timestamps/random IDs, so identical devotionals give identical bytes
+    )
+    
+    styles = get_pdf_styles()
+    
     # Build document
     story = []
     
     # Cover page
     story.append(Spacer(1, 1.5*inch))
-    story.append(Paragraph("Daily Devotionals", title_style))
-    story.append(Paragraph(f"10-Day Series", subtitle_style))
+    story.append(Paragraph("Daily Devotionals", styles['title']))
+    story.append(Paragraph(f"10-Day Series", styles['subtitle']))
     story.append(Spacer(1, 0.5*inch))
-    story.append(Paragraph(f"Source: {source_name}", attribution_style))
-    story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y')}", attribution_style))
+    story.append(Paragraph(f"Source: {source_name}", styles['attribution']))
+    story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y')}", styles['attribution']))
     story.append(PageBreak())
     
     # Each devotional
     for i, dev in enumerate(devotionals, 1):
         # Day header
-        story.append(Paragraph(f"Day {i}", section_style))
+        story.append(Paragraph(f"Day {i}", styles['section']))
         story.append(Spacer(1, 6))
         
         # Title
-        story.append(Paragraph(dev['title'], title_style))
+        story.append(Paragraph(dev['title'], styles['title']))
         story.append(Spacer(1, 12))
         
         # Narrative paragraphs
         for para in dev['narrative']:
-            story.append(Paragraph(para, body_style))
+            story.append(Paragraph(para, styles['body']))
             story.append(Spacer(1, 6))
         
         story.append(Spacer(1, 12))
         
         # Key scriptures section
-        story.append(Paragraph("Key Scriptures:", section_style))
+        story.append(Paragraph("Key Scriptures:", styles['section']))
         for scripture in dev['scriptures']:
-            story.append(Paragraph(f"• {scripture}", scripture_style))
+            story.append(Paragraph(f"• {scripture}", styles['scripture']))
         
         story.append(Spacer(1, 20))
         
         # Notes section
-        story.append(Paragraph("Personal Notes & Reflection:", section_style))
-        
-        # Create lined space for notes
-        note_lines = []
-        for _ in range(6):
-            note_lines.append(['_' * 100])
+        story.append(Paragraph("Personal Notes & Reflection:", styles['section']))
         
-        note_table = Table(note_lines, colWidths=[6.5*inch])
-        note_table.setStyle(TableStyle([
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#cccccc')),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        
-        story.append(note_table)
+        # Lined space for notes
+        story.append(NoteLines())
         story.append(Spacer(1, 20))
         
         # Attribution at bottom
         story.append(Paragraph(
             f"<i>Devotional synthesized from {source_name}</i>",
-            attribution_style
+            styles['attribution']
         ))
         
         # Page break except for last devotional
@@ -278,7 +377,6 @@ def create_devotional_pdf(devotionals, output_path, source_name):
     # Build PDF
     doc.build(story)
     
-    # Get PDF data
     pdf_data = buffer.getvalue()
     buffer.close()
     
@@ -288,17 +386,35 @@ def create_devotional_pdf(devotionals, output_path, source_name):
 # AI GENERATION
 # ============================================================================
 
+DEVOTIONAL_END = '---DEVOTIONAL END---'
+
+# One devotional block from Claude's reply; a block cut off before its END marker
+# never borrows fields from the next one
+_SECTION_BODY = r'(?:(?!---DEVOTIONAL (?:START|END)---).)*?'
+DEVOTIONAL_PATTERN = re.compile(
+    r'---DEVOTIONAL START---' + _SECTION_BODY +
+    r'TITLE:(' + _SECTION_BODY + r')NARRATIVE:(' + _SECTION_BODY +
+    r')KEY SCRIPTURES:(' + _SECTION_BODY + r')---DEVOTIONAL END---',
+    re.DOTALL
+)
+SCRIPTURE_PATTERN = re.compile(r'^[ \t]*[-•][ \t]*(.*\S)', re.MULTILINE)
+
+@st.cache_resource
+def get_anthropic_client():
+    """Get the shared Claude client (keeps its HTTP connection pool across reruns)"""
+    return anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+
 def generate_devotionals(sample_content, topic, source_name):
     """Generate 10 devotionals using Claude"""
     
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    client = get_anthropic_client()
     
     prompt = f"""You are creating 10 daily devotionals based on content from {source_name}.
 
 TOPIC: {topic}
 
 SOURCE CONTENT:
-{sample_content[:40000]}
+{sample_content}
 
 Generate exactly 10 devotionals following this structure:
 
@@ -327,61 +443,43 @@ Generate all 10 devotionals now, numbered 1-10."""
 
     with st.spinner("🤖 Generating 10 devotionals with Claude..."):
         try:
-            response = client.messages.create(
+            # Stream the reply so progress shows as each devotional completes
+            progress = st.progress(0.0, text="Writing devotional 1 of 10...")
+            parts = []
+            tail = ""
+            completed = 0
+            
+            with client.messages.stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=16000,
                 messages=[{
                     "role": "user",
                     "content": prompt
                 }]
-            )
+            ) as stream:
+                for delta in stream.text_stream:
+                    parts.append(delta)
+                    
+                    # Keep a short tail so a marker split across deltas is still counted
+                    window = tail + delta
+                    found = window.count(DEVOTIONAL_END)
+                    tail = window[-(len(DEVOTIONAL_END) - 1):]
+                    if found:
+                        completed = min(completed + found, 10)
+                        progress.progress(completed / 10, text=f"Finished {completed} of 10 devotionals...")
             
-            content = response.content[0].text
+            progress.empty()
+            content = "".join(parts)
             
-            # Parse devotionals
+            # Parse devotionals (one regex scan over the whole reply)
             devotionals = []
-            sections = content.split('---DEVOTIONAL START---')
-            
-            for section in sections[1:]:  # Skip first empty split
-                if '---DEVOTIONAL END---' not in section:
-                    continue
-                
-                section = section.split('---DEVOTIONAL END---')[0].strip()
-                
-                # Parse title
-                title_match = section.split('TITLE:', 1)
-                if len(title_match) < 2:
-                    continue
-                
-                remaining = title_match[1]
-                parts = remaining.split('NARRATIVE:', 1)
-                if len(parts) < 2:
-                    continue
-                
-                title = parts[0].strip()
-                
-                # Parse narrative
-                narrative_section = parts[1].split('KEY SCRIPTURES:', 1)
-                if len(narrative_section) < 2:
-                    continue
-                
-                narrative_text = narrative_section[0].strip()
-                narrative_paras = [p.strip() for p in narrative_text.split('\n\n') if p.strip()]
-                
-                # Parse scriptures
-                scriptures_text = narrative_section[1].strip()
-                scriptures = []
-                for line in scriptures_text.split('\n'):
-                    line = line.strip()
-                    if line.startswith('-') or line.startswith('•'):
-                        scripture = line[1:].strip()
-                        if scripture:
-                            scriptures.append(scripture)
+            for match in DEVOTIONAL_PATTERN.finditer(content):
+                title, narrative_text, scriptures_text = match.groups()
                 
                 devotionals.append({
-                    'title': title,
-                    'narrative': narrative_paras,
-                    'scriptures': scriptures
+                    'title': title.strip(),
+                    'narrative': [p.strip() for p in narrative_text.split('\n\n') if p.strip()],
+                    'scriptures': SCRIPTURE_PATTERN.findall(scriptures_text)
                 })
             
             return devotionals
@@ -472,29 +570,57 @@ with col2:
 
 st.markdown("---")
 
+fresh_set = st.checkbox(
+    "Write a new set even if these settings were used before",
+    help="Otherwise the devotionals saved for this database, topic and attribution are reused"
+)
+
 # Generation button
 if st.button("🚀 Generate 10 Devotionals", type="primary", use_container_width=True):
+    cache_key = devotional_cache_key(db_path, topic, source_attribution)
+    devotionals, date_created = (None, None) if fresh_set else load_cached_devotionals(cache_key)
     
-    # Sample content from database
-    with st.spinner("📚 Sampling content from database..."):
-        sample_content = get_sample_content(
-            db_path,
-            db_info['table_name'],
-            db_info['transcript_col']
-        )
-    
-    if not sample_content:
-        st.error("Could not sample content from database")
-        st.stop()
-    
-    st.success(f"✅ Sampled {len(sample_content.split())} words from database")
-    
-    # Generate devotionals
-    devotionals = generate_devotionals(sample_content, topic, source_attribution)
-    
-    if not devotionals:
-        st.error("Failed to generate devotionals")
-        st.stop()
+    if devotionals:
+        st.info(f"♻️ Reusing the devotionals saved on {date_created[:10]} for these settings")
+    else:
+        # Sample content from database
+        with st.spinner("📚 Sampling content from database..."):
+            sample_content = get_sample_content(
+                db_path,
+                db_info['table_name'],
+                db_info['transcript_col']
+            )
+        
+        if not sample_content:
+            st.error("Could not sample content from database")
+            st.stop()
+        
+        st.success(f"✅ Sampled {len(sample_content.split())} words from database")
+        
+        # Generate devotionals
+        devotionals = generate_devotionals(sample_content, topic, source_attribution)
+        
+        if not devotionals:
+            st.error("Failed to generate devotionals")
+            st.stop()
+        
+        # A short set (truncated reply) is shown but not kept for reuse
+        if len(devotionals) >= 10:
+            save_cached_devotionals(cache_key, devotionals)
+    
+    # Kept for later reruns (e.g. the download click); the PDF is built on the first one
+    st.session_state['devotional_result'] = {
+        'devotionals': devotionals,
+        'topic': topic,
+        'source': source_attribution,
+        'total_words': sum(len(para.split()) for dev in devotionals for para in dev['narrative']),
+        'pdf': None
+    }
+
+result = st.session_state.get('devotional_result')
+
+if result:
+    devotionals = result['devotionals']
     
     if len(devotionals) < 10:
         st.warning(f"Only generated {len(devotionals)} devotionals (expected 10)")
@@ -522,10 +648,12 @@ if st.button("🚀 Generate 10 Devotionals", type="primary", use_container_width
     st.markdown("---")
     st.subheader("📥 Download PDF")
     
-    with st.spinner("📄 Creating PDF..."):
-        pdf_data = create_devotional_pdf(devotionals, None, source_attribution)
+    if result['pdf'] is None:
+        with st.spinner("📄 Creating PDF..."):
+            result['pdf'] = create_devotional_pdf(devotionals, None, result['source'])
     
-    filename = f"devotionals-{topic.lower().replace(' ', '-')}-{datetime.now().strftime('%Y%m%d')}.pdf"
+    pdf_data = result['pdf']
+    filename = f"devotionals-{result['topic'].lower().replace(' ', '-')}-{datetime.now().strftime('%Y%m%d')}.pdf"
     
     st.download_button(
         label="📥 Download Complete PDF",
@@ -538,13 +666,11 @@ if st.button("🚀 Generate 10 Devotionals", type="primary", use_container_width
     st.success(f"✅ PDF ready! ({len(pdf_data):,} bytes)")
     
     # Stats
-    total_words = sum(len(' '.join(dev['narrative']).split()) for dev in devotionals)
-    
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("Devotionals", len(devotionals))
     with col2:
-        st.metric("Total Words", f"{total_words:,}")
+        st.metric("Total Words", f"{result['total_words']:,}")
     with col3:
         st.metric("Pages", "~20-25")
 